@@ -0,0 +1,323 @@
+"""Навантажувальний бенчмарк reminder_bot.py з підробним Telegram Bot API.
+
+Запуск:
+    python benchmark.py --users 1000 --flows 2000 --tasks 10000,50000
+    python benchmark.py --backend sqlite --json results.json
+
+Бот працює з тимчасовим сховищем, а всі запити до Bot API обробляє FakeBotApi,
+який лише записує виклики (sendMessage, editMessageText, ...) і повертає успіх.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime
+from time import perf_counter
+from zoneinfo import ZoneInfo
+
+
+# Підробний Bot API: записує виклики й відповідає як справжній сервер.
+# Клас будується вже після імпорту telegram ботом, щоб холодний запуск міряв і цей імпорт
+def fake_bot_api():
+    from telegram.request import BaseRequest
+
+    class FakeBotApi(BaseRequest):
+        def __init__(self):
+            self.calls = {}
+            self._message_ids = itertools.count(1)
+
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                             connect_timeout=None, pool_timeout=None):
+            api_method = url.rsplit('/', 1)[1]
+            parameters = request_data.parameters if request_data is not None else {}
+            self.calls[api_method] = self.calls.get(api_method, 0) + 1
+            if api_method == 'getMe':
+                result = {"id": 1, "is_bot": True, "first_name": "Reminder", "username": "reminder_bot"}
+            elif api_method in ('sendMessage', 'editMessageText'):
+                result = {
+                    "message_id": next(self._message_ids),
+                    "date": 0,
+                    "chat": {"id": int(parameters.get('chat_id', 1)), "type": "private"},
+                    "text": parameters.get('text', ''),
+                }
+            else:
+                result = True
+            return 200, json.dumps({"ok": True, "result": result}).encode()
+
+    return FakeBotApi()
+
+
+_update_ids = itertools.count(1)
+
+
+def _user(user_id):
+    return {"id": user_id, "is_bot": False, "first_name": f"User {user_id}", "username": f"user{user_id}"}
+
+
+def message_update(user_id, text):
+    message = {
+        "message_id": next(_update_ids),
+        "date": 0,
+        "chat": {"id": user_id, "type": "private"},
+        "from": _user(user_id),
+        "text": text,
+    }
+    if text.startswith('/'):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": next(_update_ids), "message": message}
+
+
+def callback_update(user_id, data):
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_update_ids)),
+            "chat_instance": "benchmark",
+            "data": data,
+            "from": _user(user_id),
+            "message": {"message_id": 1, "date": 0, "chat": {"id": user_id, "type": "private"}, "text": "..."},
+        },
+    }
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# latencies — вибірки затримок за назвою: {"e2e": [...], "process": [...]}
+def summarize(name, count, elapsed, latencies=None, **extra):
+    result = {
+        "scenario": name,
+        "count": count,
+        "elapsed_s": elapsed,
+        "per_second": count / elapsed if elapsed else 0.0,
+    }
+    line = f"{name:<28} {count:>8} за {elapsed:>8.3f} с  {result['per_second']:>10.0f}/с"
+    for label, values in (latencies or {}).items():
+        result[f"{label}_p50_ms"] = percentile(values, 0.50) * 1000
+        result[f"{label}_p99_ms"] = percentile(values, 0.99) * 1000
+        line += f"  {label} p50 {result[f'{label}_p50_ms']:.2f} мс  p99 {result[f'{label}_p99_ms']:.2f} мс"
+    result.update(extra)
+    for key, value in extra.items():
+        line += f"  {key}={value}"
+    print(line)
+    return result
+
+
+# Приріст HANDLER_DURATION за сценарій: кількість, середнє й верхня межа кошика p99 для кожного обробника
+def handler_durations(before, after, buckets):
+    durations = {}
+    for (handler,), state in sorted(after.items()):
+        previous = before.get((handler,), [0] * len(state))
+        counts = [now - then for now, then in zip(state[:-2], previous[:-2])]
+        count = state[-1] - previous[-1]
+        if not count:
+            continue
+        cumulative = 0
+        for bound, bucket_count in zip(buckets, counts):
+            cumulative += bucket_count
+            if cumulative >= 0.99 * count:
+                break
+        durations[handler] = {
+            "count": count,
+            "mean_ms": (state[-2] - previous[-2]) / count * 1000,
+            "p99_le_ms": bound * 1000,
+        }
+        print(f"    {handler:<24} {count:>8}  середнє {durations[handler]['mean_ms']:.2f} мс  p99 ≤ {bound * 1000:g} мс")
+    return durations
+
+
+async def run(args):
+    # Відлік холодного запуску починається з імпорту reminder_bot, тож telegram
+    # (через dispatcher і processing) імпортується лише після нього
+    import reminder_bot as bot
+    from models import DEFAULT_TIMEZONE, Priority, Task, User
+    from storage import open_store
+
+    api = None
+
+    def make_api():
+        nonlocal api
+        api = fake_bot_api()
+        return api
+
+    await bot.start_bot(make_request=make_api)
+    await bot.startup_task
+    application = bot.application
+
+    from telegram import Update
+
+    from dispatcher import OutboundDispatcher
+    from metrics import HANDLER_DURATION
+    from processing import ShardedUpdateProcessor
+
+    # Обробник з вимірюванням затримки від отримання до завершення обробки (e2e, разом з очікуванням
+    # у черзі, бо весь потік ставиться в чергу одразу) і власне часу обробки оновлення (process)
+    class TimedProcessor(ShardedUpdateProcessor):
+        latencies = []
+        process_times = []
+        received = {}
+
+        def put(self, update):
+            self.received[update.update_id] = perf_counter()
+            super().put(update)
+
+        async def process(self, update):
+            started = perf_counter()
+            await super().process(update)
+            done = perf_counter()
+            self.process_times.append(done - started)
+            self.latencies.append(done - self.received.pop(update.update_id))
+
+        async def drain(self):
+            await asyncio.gather(*(queue.join() for queue in self._queues))
+
+    # Черга без лімітів Telegram, щоб міряти бота, а не відро токенів
+    async def fresh_outbox():
+        if bot.outbox is not None:
+            for task in bot.outbox._tasks:
+                task.cancel()
+        bot.outbox = OutboundDispatcher(application.bot, global_rate=10 ** 9, per_chat_interval=0)
+        bot.outbox.start()
+
+    # Такт нагадувань міряється окремо, викликом run_reminder_tick
+    bot.reminder_loop_task.cancel()
+    await bot.processor.stop()
+    bot.processor = TimedProcessor(application, args.shards, args.concurrency)
+    bot.processor.start()
+    await fresh_outbox()
+
+    async def replay(name, updates):
+        bot.processor.latencies.clear()
+        bot.processor.process_times.clear()
+        before = {key: list(state) for key, state in HANDLER_DURATION._values.items()}
+        started = perf_counter()
+        for update in updates:
+            bot.processor.put(Update.de_json(update, application.bot))
+        await bot.processor.drain()
+        result = summarize(name, len(updates), perf_counter() - started,
+                           {"e2e": list(bot.processor.latencies), "process": list(bot.processor.process_times)})
+        result["handlers"] = handler_durations(before, HANDLER_DURATION._values, HANDLER_DURATION.buckets)
+        return result
+
+    # 0. Холодний запуск: від імпорту reminder_bot до прийому вебхуків і до готовності обробляти оновлення
+    results = [summarize(f"cold start: {phase}", 1, seconds) for phase, seconds in bot.startup_timings.items()]
+    rng = random.Random(args.seed)
+    user_ids = list(range(1000, 1000 + args.users))
+
+    # 1. Масова реєстрація через /start
+    results.append(await replay("start", [message_update(user_id, "/start") for user_id in user_ids]))
+
+    # 2. Повний сценарій додавання: меню -> виконавець -> текст -> пріоритет
+    flows = []
+    for flow in range(args.flows):
+        assigner = user_ids[flow % len(user_ids)]
+        assignee = rng.choice(user_ids)
+        flows += [
+            message_update(assigner, '📝 Додати завдання'),
+            callback_update(assigner, f"assign_{assignee}"),
+            message_update(assigner, f"Завдання {flow}"),
+            callback_update(assigner, rng.choice(list(Priority)).value),
+        ]
+    results.append(await replay("add_task flow (updates)", flows))
+
+    # 3. Масове завершення завдань
+    completions = [callback_update(task.assignee_id, f"finish_{task.id}") for task in bot.store.all_tasks()]
+    results.append(await replay("complete", completions))
+
+    # 4. Вартість одного запису у сховище (колишній update_data())
+    write_latencies = []
+    started = perf_counter()
+    for number in range(args.writes):
+        write_started = perf_counter()
+        task = bot.store.add_task(Task(rng.choice(user_ids), f"Запис {number}", Priority.LOW, "@benchmark", 1))
+        bot.store.complete_task(task.assignee_id, task.id)
+        write_latencies.append(perf_counter() - write_started)
+    results.append(summarize(f"store write ({args.backend})", args.writes, perf_counter() - started, {"write": write_latencies}))
+
+    # 5. Відновлення розкладів і такт нагадувань залежно від кількості завдань
+    # Середина робочого дня в типовому поясі користувачів
+    tick_time = datetime.now(ZoneInfo(DEFAULT_TIMEZONE)).replace(hour=10, minute=0, second=0, microsecond=0)
+    main_store = bot.store
+    for task_count in args.tasks:
+        data_file = os.path.join(args.data_dir, f"tick_{task_count}.json")
+        bot.store = open_store(data_file, args.backend, os.path.join(args.data_dir, f"tick_{task_count}.db"))
+        if args.backend == 'journal':
+            # Без fsync на кожен запис, щоб швидко наповнити сховище
+            bot.store.fsync = False
+        tick_users = user_ids[:max(1, min(len(user_ids), task_count // 5))]
+        for user_id in tick_users:
+            bot.store.register_user(User(user_id, f"@user{user_id}"))
+        for number in range(task_count):
+            bot.store.add_task(Task(rng.choice(tick_users), f"Завдання {number}", rng.choice(list(Priority)), "@benchmark", 1))
+
+        bot.store.close()
+        started = perf_counter()
+        bot.store = open_store(data_file, args.backend, os.path.join(args.data_dir, f"tick_{task_count}.db"))
+        results.append(summarize(f"store load ({args.backend})", task_count, perf_counter() - started))
+
+        bot.reminders = type(bot.reminders)()
+        schedules, _, restore_elapsed = await bot.restore_reminders()
+        results.append(summarize("restore_reminders", task_count, restore_elapsed, schedules=schedules))
+
+        await fresh_outbox()
+        bot.reminders.schedule_many((user_id, priority, tick_time) for user_id, priority in list(bot.reminders._entries))
+        started = perf_counter()
+        bot.run_reminder_tick(tick_time)
+        results.append(summarize("reminder tick", task_count, perf_counter() - started, schedules=schedules, queued=len(bot.outbox)))
+        bot.store.close()
+    bot.store = main_store
+    await fresh_outbox()
+
+    await bot.stop_bot()
+    print("Виклики Bot API:", ", ".join(f"{method}={count}" for method, count in sorted(api.calls.items())))
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000, help="кількість користувачів")
+    parser.add_argument('--flows', type=int, default=2000, help="кількість сценаріїв додавання завдання")
+    parser.add_argument('--writes', type=int, default=2000, help="кількість записів у сховище")
+    parser.add_argument('--tasks', type=lambda value: [int(item) for item in value.split(',')], default=[10000, 50000],
+                        help="розміри набору завдань для такту нагадувань, через кому")
+    parser.add_argument('--backend', choices=['journal', 'sqlite'], default='journal')
+    parser.add_argument('--mode', choices=['each', 'digest'], default='each', help="режим доставки нагадувань")
+    parser.add_argument('--shards', type=int, default=32)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="файл для результатів у JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory(prefix="reminder_bot_bench_") as data_dir:
+        args.data_dir = data_dir
+        # reminder_bot читає налаштування сховища при імпорті
+        os.environ.setdefault('TELEGRAM_TOKEN', "123456:benchmark")
+        os.environ['DATA_FILE'] = os.path.join(data_dir, "tasks_data.json")
+        os.environ['STORAGE_BACKEND'] = args.backend
+        os.environ['REMINDER_MODE'] = args.mode
+        os.environ['SQLITE_PATH'] = os.path.join(data_dir, "tasks_data.db")
+        results = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=4)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
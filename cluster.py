@@ -0,0 +1,68 @@
+import asyncio
+import errno
+import fcntl
+import os
+
+# Як часто повторювати спробу взяти зайняте блокування шарду (секунди)
+SHARD_LOCK_POLL = 0.005
+
+
+# Вибір лідера між процесами: виключне flock на файлі.
+# Ядро знімає блокування, щойно процес-лідер завершується (навіть аварійно),
+# тож наступна спроба будь-якого іншого процесу робить лідером його.
+class LeaderLock:
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    @property
+    def is_leader(self):
+        return self._fd is not None
+
+    # Неблокуюча спроба стати лідером; True, якщо цей процес — лідер
+    def try_acquire(self):
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        # pid лідера — лише для діагностики
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+# Міжпроцесні блокування шардів: байт з номером шарду в одному файлі (fcntl.lockf).
+# Блокування записів POSIX належать процесу, тому всередині процесу порядок шарду
+# забезпечує черга ShardedUpdateProcessor, а цей клас — виключність між процесами.
+class ShardLocks:
+    def __init__(self, path):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    async def acquire(self, shard):
+        while True:
+            try:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, shard)
+                return
+            except OSError as e:
+                if e.errno not in (errno.EACCES, errno.EAGAIN):
+                    raise
+            # Не блокуємо цикл подій очікуванням на fcntl
+            await asyncio.sleep(SHARD_LOCK_POLL)
+
+    def release(self, shard):
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, shard)
+
+    def close(self):
+        os.close(self._fd)
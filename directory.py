@@ -0,0 +1,47 @@
+import bisect
+
+# Кількість користувачів на одній сторінці вибору виконавця
+PAGE_SIZE = 8
+
+# Верхня межа для пошуку за префіксом
+_MAX_CHAR = '\U0010ffff'
+
+
+def _sort_key(username):
+    return username.lstrip('@').lower()
+
+
+# Відсортований індекс імен користувачів для вибору виконавця.
+# Будується один раз при старті й оновлюється при реєстрації користувача,
+# а сторінка або пошук за префіксом — це бінарний пошук + зріз, O(log n + PAGE_SIZE).
+class UserDirectory:
+    def __init__(self, users=()):
+        self._names = {}
+        self._index = []
+        for user in users:
+            self._names[user.id] = user.username
+            self._index.append((_sort_key(user.username), user.id, user.username))
+        self._index.sort()
+
+    def __len__(self):
+        return len(self._index)
+
+    def add(self, user_id, username):
+        old = self._names.get(user_id)
+        if old == username:
+            return
+        if old is not None:
+            position = bisect.bisect_left(self._index, (_sort_key(old), user_id))
+            del self._index[position]
+        self._names[user_id] = username
+        bisect.insort(self._index, (_sort_key(username), user_id, username))
+
+    # Повертає ([(user_id, username), ...], чи є наступна сторінка)
+    def page(self, prefix='', page=0, page_size=PAGE_SIZE):
+        prefix = _sort_key(prefix)
+        lo = bisect.bisect_left(self._index, (prefix,))
+        hi = bisect.bisect_left(self._index, (prefix + _MAX_CHAR,)) if prefix else len(self._index)
+        start = lo + page * page_size
+        end = min(start + page_size, hi)
+        entries = [(user_id, username) for _, user_id, username in self._index[start:end]]
+        return entries, end < hi
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+from metrics import OUTBOUND_DROPPED, OUTBOUND_ERRORS, OUTBOUND_SEND_DURATION, OUTBOUND_SENT
+
+logger = logging.getLogger(__name__)
+
+# Ліміти Telegram: ~30 повідомлень/с загалом і 1 повідомлення/с в один чат
+GLOBAL_RATE = 30
+PER_CHAT_INTERVAL = 1.0
+WORKERS = 8
+MAX_ATTEMPTS = 5
+MAX_MESSAGE_LENGTH = 4096
+
+
+# Глобальне відро токенів; block() призупиняє видачу після 429
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def block(self, seconds):
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# Черга вихідних повідомлень: обробники лише ставлять повідомлення в чергу,
+# а воркери надсилають їх з дотриманням глобального ліміту і ліміту на чат.
+# Кожен чат одночасно обробляє не більше одного воркера, тому порядок зберігається;
+# кілька нагадувань, що чекають в одному чаті, зливаються в одне повідомлення.
+class OutboundDispatcher:
+    def __init__(self, bot, workers=WORKERS, global_rate=GLOBAL_RATE, per_chat_interval=PER_CHAT_INTERVAL):
+        self.bot = bot
+        self.workers = workers
+        self.per_chat_interval = per_chat_interval
+        self._bucket = TokenBucket(global_rate)
+        self._pending = {}
+        self._next_allowed = {}
+        self._ready = None
+        self._tasks = []
+
+    def start(self):
+        self._ready = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout=10):
+        # Даємо черзі доставити вже прийняті повідомлення
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def __len__(self):
+        return sum(len(pending) for pending in self._pending.values())
+
+    # Постановка повідомлення в чергу; coalesce=True дозволяє зливати його з сусідніми
+    def send(self, chat_id, text, coalesce=False, **kwargs):
+        pending = self._pending.get(chat_id)
+        if pending is None:
+            pending = self._pending[chat_id] = deque()
+            self._make_ready_later(chat_id)
+        pending.append({'text': text, 'coalesce': coalesce, 'kwargs': kwargs, 'attempts': 0})
+
+    def _make_ready_later(self, chat_id):
+        delay = self._next_allowed.get(chat_id, 0) - time.monotonic()
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._ready.put_nowait, chat_id)
+        else:
+            self._ready.put_nowait(chat_id)
+
+    def _forget(self, chat_id):
+        if chat_id not in self._pending:
+            self._next_allowed.pop(chat_id, None)
+
+    # Бере наступне повідомлення чату, зливаючи послідовні нагадування
+    def _take(self, pending):
+        message = pending.popleft()
+        if not message['coalesce']:
+            return message
+        texts = [message['text']]
+        length = len(message['text'])
+        while pending and pending[0]['coalesce'] and not pending[0]['kwargs'] and not message['kwargs']:
+            next_length = length + 2 + len(pending[0]['text'])
+            if next_length > MAX_MESSAGE_LENGTH:
+                break
+            texts.append(pending.popleft()['text'])
+            length = next_length
+        if len(texts) > 1:
+            message = dict(message, text="\n\n".join(texts))
+        return message
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            pending = self._pending[chat_id]
+            message = self._take(pending)
+            await self._bucket.acquire()
+            retry_in = await self._deliver(chat_id, message)
+            now = time.monotonic()
+            if retry_in is not None:
+                pending.appendleft(message)
+                self._next_allowed[chat_id] = now + retry_in
+            else:
+                self._next_allowed[chat_id] = now + self.per_chat_interval
+            if pending:
+                self._make_ready_later(chat_id)
+            else:
+                del self._pending[chat_id]
+                asyncio.get_running_loop().call_later(self.per_chat_interval, self._forget, chat_id)
+
+    # Повертає затримку до повторної спроби або None, якщо повідомлення оброблено
+    async def _deliver(self, chat_id, message):
+        message['attempts'] += 1
+        started = time.perf_counter()
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=message['text'], **message['kwargs'])
+            OUTBOUND_SENT.inc()
+            return None
+        except RetryAfter as e:
+            OUTBOUND_ERRORS.inc(reason='retry_after')
+            logger.warning(f"Перевищено ліміт Telegram, повтор через {e.retry_after} с")
+            self._bucket.block(e.retry_after)
+            retry_in = e.retry_after
+        except (Forbidden, BadRequest) as e:
+            OUTBOUND_ERRORS.inc(reason='forbidden' if isinstance(e, Forbidden) else 'bad_request')
+            OUTBOUND_DROPPED.inc()
+            logger.error(f"Не вдалося надіслати повідомлення користувачу {chat_id}: {e}")
+            return None
+        except NetworkError as e:
+            OUTBOUND_ERRORS.inc(reason='network')
+            retry_in = 2 ** message['attempts']
+            logger.warning(f"Помилка мережі при надсиланні користувачу {chat_id}: {e}")
+        except Exception as e:
+            OUTBOUND_ERRORS.inc(reason='other')
+            OUTBOUND_DROPPED.inc()
+            logger.error(f"Не вдалося надіслати повідомлення користувачу {chat_id}: {e}")
+            return None
+        finally:
+            OUTBOUND_SEND_DURATION.observe(time.perf_counter() - started)
+        if message['attempts'] >= MAX_ATTEMPTS:
+            OUTBOUND_DROPPED.inc()
+            logger.error(f"Повідомлення користувачу {chat_id} відкинуто після {message['attempts']} спроб")
+            return None
+        return retry_in
@@ -0,0 +1,17 @@
+# Запуск кількох процесів бота зі спільним сховищем SQLite:
+#     gunicorn reminder_bot:asgi_app -c gunicorn.conf.py
+import multiprocessing
+import os
+
+# Процеси ділять одне сховище лише в SQLite
+os.environ.setdefault('STORAGE_BACKEND', 'sqlite')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# reminder_bot ділить ліміт надсилання Telegram на кількість процесів
+os.environ['WEB_CONCURRENCY'] = str(workers)
+worker_class = 'uvicorn.workers.UvicornWorker'
+# Без preload: кожен процес сам імпортує бота і відкриває власне з'єднання з SQLite
+preload_app = False
+timeout = 60
+graceful_timeout = 30
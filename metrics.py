@@ -0,0 +1,231 @@
+import bisect
+import collections
+import functools
+import sys
+import threading
+import time
+
+# Межі гістограм затримок (секунди)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Лічильник, що лише зростає; значення зберігаються окремо для кожного набору міток
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = collections.defaultdict(int)
+
+    def inc(self, amount=1, **labels):
+        self._values[tuple(labels[name] for name in self.labelnames)] += amount
+
+    def samples(self):
+        for values, value in list(self._values.items()):
+            yield self.name, _format_labels(self.labelnames, values), value
+
+
+# Поточне значення; callback обчислює його під час збирання метрик
+# і повертає число або словник {значення міток: число}
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        self._values[tuple(labels[name] for name in self.labelnames)] = value
+
+    def samples(self):
+        if self.callback is None:
+            yield from super().samples()
+            return
+        value = self.callback()
+        if not isinstance(value, dict):
+            value = {(): value}
+        for values, sample in value.items():
+            values = values if isinstance(values, tuple) else (values,)
+            yield self.name, _format_labels(self.labelnames, values), sample
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        # значення міток -> [лічильники за межами..., сума, кількість]
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    # Вимірювання тривалості блоку: with HISTOGRAM.time(label=...):
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def samples(self):
+        for values, state in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                yield self.name + '_bucket', _format_labels(self.labelnames, values, [('le', _format_value(bound))]), cumulative
+            labels = _format_labels(self.labelnames, values)
+            yield self.name + '_sum', labels, state[-2]
+            yield self.name + '_count', labels, state[-1]
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    # Текстовий формат Prometheus (text/plain; version=0.0.4)
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            try:
+                for name, labels, value in metric.samples():
+                    lines.append(f"{name}{labels} {_format_value(value)}")
+            except Exception as e:
+                lines.append(f"# помилка збирання {metric.name}: {e}")
+        return ("\n".join(lines) + "\n").encode('utf-8')
+
+
+REGISTRY = Registry()
+
+HANDLER_CALLS = REGISTRY.counter('bot_handler_calls_total', "Виклики обробників", ['handler'])
+HANDLER_ERRORS = REGISTRY.counter('bot_handler_errors_total', "Винятки в обробниках", ['handler'])
+HANDLER_DURATION = REGISTRY.histogram('bot_handler_duration_seconds', "Тривалість обробників", ['handler'])
+
+STORE_WRITE_DURATION = REGISTRY.histogram('bot_store_write_seconds', "Серіалізація і запис у сховище", ['backend', 'op'])
+
+OUTBOUND_SEND_DURATION = REGISTRY.histogram('bot_outbound_send_seconds', "Тривалість запиту sendMessage")
+OUTBOUND_SENT = REGISTRY.counter('bot_outbound_sent_total', "Надіслані повідомлення")
+OUTBOUND_ERRORS = REGISTRY.counter('bot_outbound_errors_total', "Помилки надсилання за типом", ['reason'])
+OUTBOUND_DROPPED = REGISTRY.counter('bot_outbound_dropped_total', "Повідомлення, відкинуті після помилки")
+
+
+# Обгортка обробника Telegram: кількість викликів, помилок і тривалість
+def instrument(handler_name):
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            HANDLER_CALLS.inc(handler=handler_name)
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                HANDLER_ERRORS.inc(handler=handler_name)
+                raise
+            finally:
+                HANDLER_DURATION.observe(time.perf_counter() - started, handler=handler_name)
+        return wrapper
+    return decorator
+
+
+# Семплюючий профайлер: фоновий потік з інтервалом interval знімає стек
+# потоку циклу подій і рахує однакові стеки (формат collapsed для flamegraph.pl / speedscope).
+# Накладні витрати — лише на момент знімка, обробники не інструментуються.
+class SamplingProfiler:
+    def __init__(self, interval=0.01, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples = 0
+        self._stacks = collections.Counter()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reset(self):
+        self._stacks.clear()
+        self.samples = 0
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            self._stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    # Стеки у форматі "кадр;кадр;кадр кількість", найчастіші першими
+    def render(self, limit=None):
+        lines = [f"{stack} {count}" for stack, count in self._stacks.most_common(limit)]
+        return ("\n".join(lines) + "\n").encode('utf-8')
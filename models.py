@@ -0,0 +1,212 @@
+import json
+import sys
+from datetime import time
+from enum import Enum
+from typing import NamedTuple
+from zoneinfo import ZoneInfo
+
+# Швидкий JSON-декодер для знімка і журналу, якщо встановлено orjson
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Версія формату знімка tasks_data.json
+# 1 — {"tasks": {"<user_id>": [...]}, "user_data": {"<user_id>": {...}}} з рядковими ключами
+# 2 — списки записів з числовими id
+SCHEMA_VERSION = 2
+
+
+class Priority(Enum):
+    URGENT = 'urgent'
+    MEDIUM = 'medium'
+    LOW = 'low'
+
+    @property
+    def label(self):
+        return PRIORITY_LABELS[self]
+
+
+# Пошук пріоритету за значенням без виклику Priority(...) — він помітний при завантаженні
+# сотень тисяч завдань
+PRIORITY_BY_VALUE = {priority.value: priority for priority in Priority}
+PRIORITY_BY_VALUE.update({priority: priority for priority in Priority})
+
+# Словник для перекладу пріоритетів
+PRIORITY_LABELS = {
+    Priority.URGENT: 'Терміново',
+    Priority.MEDIUM: 'Середній',
+    Priority.LOW: 'Низький'
+}
+
+
+# Типові часовий пояс і робочі години користувача: з 7:00 до 20:00 за Києвом
+DEFAULT_TIMEZONE = 'Europe/Kyiv'
+WORK_START = time(7, 0)
+WORK_END = time(20, 0)
+
+
+# Робочі години в часовому поясі користувача; однакові налаштування дають рівні значення,
+# тож користувачів можна групувати за ними
+class WorkingHours(NamedTuple):
+    tz: str
+    start: time
+    end: time
+
+    @property
+    def zone(self):
+        # ZoneInfo кешує пояси за назвою
+        return ZoneInfo(self.tz)
+
+
+def parse_time(value):
+    return value if isinstance(value, time) else time.fromisoformat(value)
+
+
+class User:
+    __slots__ = ('id', 'username', 'chat_id', 'tz', 'work_start', 'work_end')
+
+    def __init__(self, id, username, chat_id=None, tz=None, work_start=None, work_end=None):
+        self.id = id
+        self.username = username
+        self.chat_id = chat_id if chat_id is not None else id
+        self.tz = tz or DEFAULT_TIMEZONE
+        self.work_start = parse_time(work_start) if work_start is not None else WORK_START
+        self.work_end = parse_time(work_end) if work_end is not None else WORK_END
+
+    @property
+    def hours(self):
+        return WorkingHours(self.tz, self.work_start, self.work_end)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'chat_id': self.chat_id,
+            'tz': self.tz,
+            'work_start': self.work_start.strftime('%H:%M'),
+            'work_end': self.work_end.strftime('%H:%M'),
+        }
+
+    @classmethod
+    def from_dict(cls, data, user_id=None):
+        user_id = int(data.get('id', user_id))
+        return cls(
+            user_id,
+            data.get('username') or f"Користувач {user_id}",
+            data.get('chat_id'),
+            data.get('tz'),
+            data.get('work_start'),
+            data.get('work_end'),
+        )
+
+
+class Task:
+    __slots__ = ('id', 'assignee_id', 'task_text', 'priority', 'assigned_by', 'assigned_by_id')
+
+    def __init__(self, assignee_id, task_text, priority, assigned_by, assigned_by_id, id=None):
+        self.id = id
+        self.assignee_id = assignee_id
+        self.task_text = task_text
+        self.priority = PRIORITY_BY_VALUE.get(priority) or Priority(priority)
+        # Один рядок "@username" на всі завдання постановника
+        self.assigned_by = sys.intern(assigned_by)
+        self.assigned_by_id = assigned_by_id
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'assignee_id': self.assignee_id,
+            'task_text': self.task_text,
+            'priority': self.priority.value,
+            'assigned_by': self.assigned_by,
+            'assigned_by_id': self.assigned_by_id,
+        }
+
+    @classmethod
+    def from_dict(cls, data, assignee_id=None):
+        return cls(
+            int(data.get('assignee_id', assignee_id)),
+            data['task_text'],
+            data['priority'],
+            data['assigned_by'],
+            int(data['assigned_by_id']),
+            data.get('id'),
+        )
+
+
+# Стан у пам'яті: завдання виконавця — словник {id: Task} у порядку додавання
+def empty_state():
+    return {"tasks": {}, "users": {}, "reminders": {}, "next_task_id": 1, "seq": 0, "schema": SCHEMA_VERSION}
+
+
+# Додавання завдання до стану з видачею id, якщо його ще немає
+def put_task(state, task):
+    if task.id is None:
+        task.id = state["next_task_id"]
+    state["next_task_id"] = max(state["next_task_id"], task.id + 1)
+    state["tasks"].setdefault(task.assignee_id, {})[task.id] = task
+    return task
+
+
+# Версія 1 записувала і рядкові, і числові ключі одного користувача як "123",
+# тож при читанні дублікати списків завдань зливаються, а не перезаписуються
+def _merge_duplicate_keys(pairs):
+    result = {}
+    for key, value in pairs:
+        if key in result and isinstance(result[key], list) and isinstance(value, list):
+            result[key] = result[key] + value
+        else:
+            result[key] = value
+    return result
+
+
+def json_loads(text):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def decode_state(text):
+    data = json_loads(text)
+    if data.get("schema", 1) == 1:
+        # Дублікати ключів видно лише під час розбору, тож версію 1 розбираємо повторно
+        data = json.loads(text, object_pairs_hook=_merge_duplicate_keys)
+    return load_state(data)
+
+
+def load_state(data):
+    state = empty_state()
+    state["next_task_id"] = data.get("next_task_id", 1)
+    state["seq"] = data.get("seq", 0)
+    state["schema"] = data.get("schema", 1)
+    if state["schema"] == 1:
+        for user_id, info in data.get("user_data", {}).items():
+            user = User.from_dict(info, user_id)
+            state["users"][user.id] = user
+        for user_id, user_tasks in data.get("tasks", {}).items():
+            for task in user_tasks:
+                put_task(state, Task.from_dict(task, user_id))
+        for user_id, fired in data.get("reminders", {}).items():
+            for priority, fired_at in fired.items():
+                state["reminders"][(int(user_id), Priority(priority))] = fired_at
+    else:
+        for info in data.get("users", []):
+            user = User.from_dict(info)
+            state["users"][user.id] = user
+        for task in data.get("tasks", []):
+            put_task(state, Task.from_dict(task))
+        for user_id, priority, fired_at in data.get("reminders", []):
+            state["reminders"][(user_id, Priority(priority))] = fired_at
+    return state
+
+
+def dump_state(state):
+    return {
+        "schema": SCHEMA_VERSION,
+        "seq": state["seq"],
+        "next_task_id": state["next_task_id"],
+        "users": [user.to_dict() for user in state["users"].values()],
+        "tasks": [task.to_dict() for user_tasks in state["tasks"].values() for task in user_tasks.values()],
+        "reminders": [[user_id, priority.value, fired_at] for (user_id, priority), fired_at in state["reminders"].items()],
+    }
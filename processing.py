@@ -0,0 +1,106 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Кількість шардів і скільки оновлень можуть оброблятися одночасно
+SHARDS = 32
+CONCURRENCY = 16
+
+
+# Ключ шарду: користувач, інакше чат, інакше саме оновлення
+def shard_key(update):
+    if update.effective_user is not None:
+        return update.effective_user.id
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    return update.update_id
+
+
+# Конкурентна обробка оновлень з розбиттям на шарди за користувачем.
+# Кожен шард має одну чергу і одного воркера, тому оновлення одного користувача
+# обробляються строго по черзі (стан STATE_ENTER_TASK -> STATE_SELECT_PRIORITY
+# у context.user_data не ламається), а різні користувачі — паралельно.
+class ShardedUpdateProcessor:
+    def __init__(self, application, shards=SHARDS, concurrency=CONCURRENCY):
+        self.application = application
+        self.shards = shards
+        self.concurrency = concurrency
+        self._queues = []
+        self._locks = []
+        self._tasks = []
+        self._semaphore = None
+
+    def start(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._queues = [asyncio.Queue() for _ in range(self.shards)]
+        self._locks = [asyncio.Lock() for _ in range(self.shards)]
+        self._tasks = [asyncio.create_task(self._worker(queue)) for queue in self._queues]
+
+    async def stop(self, timeout=10):
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Не оброблено {self.qsize()} оновлень при зупинці")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def qsize(self):
+        return sum(queue.qsize() for queue in self._queues)
+
+    def shard_of(self, key):
+        return key % self.shards
+
+    def put(self, update):
+        self._queues[self.shard_of(shard_key(update))].put_nowait(update)
+
+    # Блокування частини сховища, що належить користувачу
+    def lock_for(self, user_id):
+        return self._locks[self.shard_of(user_id)]
+
+    async def process(self, update):
+        await self.application.process_update(update)
+
+    async def _worker(self, queue):
+        while True:
+            update = await queue.get()
+            try:
+                async with self._semaphore:
+                    await self.process(update)
+            except Exception:
+                logger.exception(f"Помилка обробки оновлення {update.update_id}")
+            finally:
+                queue.task_done()
+
+
+# Обробка в режимі кількох процесів: оновлення будь-якого користувача може прийти
+# в будь-який процес, тому стан розмови (context.user_data) читається зі спільного
+# сховища перед обробкою і записується після неї, а шард одночасно обробляє лише
+# один процес (cluster.ShardLocks).
+class SharedStateProcessor(ShardedUpdateProcessor):
+    def __init__(self, application, store, shard_locks, shards=SHARDS, concurrency=CONCURRENCY):
+        super().__init__(application, shards, concurrency)
+        self.store = store
+        self.shard_locks = shard_locks
+
+    async def process(self, update):
+        shard = self.shard_of(shard_key(update))
+        await self.shard_locks.acquire(shard)
+        try:
+            user = update.effective_user
+            if user is None:
+                await super().process(update)
+                return
+            user_data = self.application.user_data[user.id]
+            user_data.clear()
+            user_data.update(self.store.load_conversation(user.id))
+            try:
+                await super().process(update)
+                self.store.save_conversation(user.id, dict(user_data))
+            finally:
+                # Локальна копія не потрібна: наступне оновлення може обробити інший процес
+                self.application.drop_user_data(user.id)
+        finally:
+            self.shard_locks.release(shard)
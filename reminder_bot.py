@@ -1,55 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
 import logging
 import os
-import json
-from datetime import time, datetime
-from flask import Flask, request
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
-from telegram.ext import (
-    ApplicationBuilder,
-    CommandHandler,
-    CallbackQueryHandler,
-    ContextTypes,
-    MessageHandler,
-    filters
-)
+import secrets
+import signal
+from datetime import datetime, time, timedelta, timezone
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+# Точка відліку часу запуску
+IMPORT_STARTED = perf_counter()
+
+# telegram — найважча залежність (сотні мілісекунд імпорту), тож модуль її не імпортує:
+# бібліотека завантажується у фоні (warm_up), а функції імпортують потрібні імена
+# локально, коли вона вже в sys.modules
+if TYPE_CHECKING:
+    from telegram import Update
+    from telegram.ext import ContextTypes
+
+import uvicorn
+from storage import open_store
+from scheduler import PRIORITY_INTERVALS, ReminderScheduler, in_working_hours, next_due, next_window_open, within_hours
+from webhook import create_webhook_app
+from directory import UserDirectory
+from models import Priority, Task, User, WorkingHours, DEFAULT_TIMEZONE, WORK_START, WORK_END
+from processing import CONCURRENCY, SHARDS, ShardedUpdateProcessor, SharedStateProcessor
+from cluster import LeaderLock, ShardLocks
+from metrics import REGISTRY, SamplingProfiler, instrument
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import templates
 
 # Налаштування логування
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Створення Flask додатку
-app = Flask(__name__)
-
 # Глобальна змінна для Application
 application = None
 
-# Шлях до файлу для зберігання даних
-DATA_FILE = "tasks_data.json"
+# Черга вихідних повідомлень (створюється після ініціалізації бота)
+outbox = None
 
-# Завантаження даних з файлу
-def load_data():
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'r', encoding='utf-8') as file:
-            return json.load(file)
-    return {"tasks": {}, "user_data": {}}
-
-# Збереження даних у файл
-def save_data(data):
-    with open(DATA_FILE, 'w', encoding='utf-8') as file:
-        json.dump(data, file, ensure_ascii=False, indent=4)
-
-# Оновлення даних у файлі
-def update_data():
-    data_to_save = {
-        "tasks": tasks,
-        "user_data": user_data
-    }
-    save_data(data_to_save)
+# Шардована обробка оновлень (створюється після ініціалізації бота)
+processor = None
+UPDATE_SHARDS = int(os.environ.get('UPDATE_SHARDS', SHARDS))
+UPDATE_CONCURRENCY = int(os.environ.get('UPDATE_CONCURRENCY', CONCURRENCY))
 
-# Ініціалізація даних при запуску бота
-data = load_data()
-tasks = data.get("tasks", {})
-user_data = data.get("user_data", {})
+# Налаштування вебхука
+# Токен бота і секрет вебхука задаються лише через оточення (див. render.yaml)
+TOKEN = os.environ.get('TELEGRAM_TOKEN')
+PORT = int(os.environ.get('PORT', 5000))
+WEBHOOK_PATH = '/webhook'
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL', f'https://reminder-bot-m6pm.onrender.com{WEBHOOK_PATH}')
+# Секрет для заголовка X-Telegram-Bot-Api-Secret-Token. Без WEBHOOK_SECRET єдиний процес
+# генерує випадковий секрет при кожному запуску; кілька процесів мусять мати спільний
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET')
+
+# Шлях до файлу для зберігання даних
+DATA_FILE = os.environ.get('DATA_FILE', "tasks_data.json")
+
+# Сховище: journal (знімок + журнал у JSON) або sqlite
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'journal')
+SQLITE_PATH = os.environ.get('SQLITE_PATH')
+
+# Доставка нагадувань: each — окреме повідомлення на кожне завдання,
+# digest — одне повідомлення на користувача за такт з кнопками завершення
+REMINDER_MODE = os.environ.get('REMINDER_MODE', 'each')
+# Скільки завдань з кнопками показувати в одному дайджесті
+DIGEST_MAX_TASKS = 20
+# Останній дайджест користувача: {user_id: (id завдань, час надсилання)}
+digest_sent = {}
+
+# Режим кількох процесів (gunicorn reminder_bot:asgi_app -c gunicorn.conf.py):
+# спільне сховище SQLite, файли блокувань лідера й шардів — поруч із ним
+LOCK_PREFIX = os.path.splitext(SQLITE_PATH or DATA_FILE)[0]
+LEADER_LOCK_PATH = os.environ.get('LEADER_LOCK_PATH', LOCK_PREFIX + '.leader.lock')
+SHARD_LOCK_PATH = os.environ.get('SHARD_LOCK_PATH', LOCK_PREFIX + '.shards.lock')
+WORKER_PROCESSES = int(os.environ.get('WEB_CONCURRENCY', 1))
+leader = None
+shard_locks = None
+webhook_app = None
+
+# Завантаження даних
+def load_data():
+    return open_store(DATA_FILE, STORAGE_BACKEND, SQLITE_PATH)
+
+# Сховище відкривається у фоні вже після старту HTTP-сервера (див. warm_up)
+store = None
+
+# Відсортований індекс користувачів для вибору виконавця
+directory = UserDirectory()
+directory_marker = 0
+
+# Фоновий запуск: ready встановлюється, коли сховище завантажене і бот готовий обробляти оновлення;
+# оновлення, що надійшли раніше, чекають в early_updates
+ready = None
+early_updates = []
+startup_task = None
+reminder_loop_task = None
+# Ціль для часу від імпорту до готовності (секунди) і виміряні етапи запуску
+STARTUP_TARGET = float(os.environ.get('STARTUP_TARGET', 2.0))
+startup_timings = {}
+
+# Планувальник нагадувань і період його такту (секунди)
+reminders = ReminderScheduler()
+REMINDER_TICK = 30
+# Найбільший id завдання, яке лідер уже врахував у розкладі
+task_marker = 0
+# Скільки розкладів відновлювати між поступками циклу подій
+RESTORE_BATCH = 5000
+
+# Семплюючий профайлер циклу подій: PROFILER=1 вмикає його при старті й маршрут /profile
+PROFILER_ENABLED = os.environ.get('PROFILER', '') not in ('', '0')
+PROFILER_INTERVAL = float(os.environ.get('PROFILER_INTERVAL', 0.01))
+# Токен для /metrics і /profile (Authorization: Bearer ...); без нього — доступ лише з localhost
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+profiler = None
+
+# Метрики, що обчислюються в момент запиту /metrics
+REGISTRY.gauge('bot_update_queue_depth', "Оновлення, що чекають обробки",
+               callback=lambda: processor.qsize() if processor is not None else 0)
+REGISTRY.gauge('bot_outbox_pending', "Повідомлення в черзі надсилання",
+               callback=lambda: len(outbox) if outbox is not None else 0)
+REGISTRY.gauge('bot_reminders_scheduled', "Заплановані нагадування за пріоритетом", ['priority'],
+               callback=lambda: {priority.value: count for priority, count in reminders.counts().items()})
+REGISTRY.gauge('bot_store_size_bytes', "Розмір файлів сховища на диску", ['backend'],
+               callback=lambda: {STORAGE_BACKEND: store.size_bytes()} if store is not None else {})
+REGISTRY.gauge('bot_startup_seconds', "Тривалість етапів запуску від імпорту модуля", ['phase'],
+               callback=lambda: dict(startup_timings))
+DIGESTS = REGISTRY.counter('bot_reminder_digests_total', "Дайджести нагадувань: надіслані й пропущені без змін", ['result'])
 
 # Стани бота
 STATE_SELECT_USER = 1
@@ -57,18 +137,13 @@ STATE_ENTER_TASK = 2
 STATE_SELECT_PRIORITY = 3
 STATE_CANNOT_COMPLETE = 4
 
-# Словник для перекладу пріоритетів
-priority_translation = {
-    'urgent': 'Терміново',
-    'medium': 'Середній',
-    'low': 'Низький'
-}
-
 # Головне меню
 def main_menu_keyboard():
+    from telegram import ReplyKeyboardMarkup
     return ReplyKeyboardMarkup([
         ['📝 Додати завдання', '✅ Завершити завдання'],
-        ['📋 Мої завдання', '🚫 Не можу виконати']
+        ['📋 Мої завдання', '🚫 Не можу виконати'],
+        ['📤 Призначені мною']
     ], resize_keyboard=True)
 
 # Команда /start
@@ -80,12 +155,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
 
     # Додавання користувача до user_data, якщо його там немає
-    if user.id not in user_data:
-        user_data[user.id] = {
-            'username': user.username if user.username else f"Користувач {user.id}",
-            'chat_id': user.id
-        }
-        update_data()  # Оновлення даних у файлі
+    if not store.has_user(user.id):
+        register_user(user.id, user.username if user.username else f"Користувач {user.id}")
 
     await update.message.reply_text(
         "Вітаю! Оберіть дію:",
@@ -99,51 +170,142 @@ async def show_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     user_id = update.effective_user.id
-    if user_id not in tasks or not tasks[user_id]:
+    user_tasks = store.tasks_for(user_id)
+    if not user_tasks:
         await update.message.reply_text("У вас немає активних завдань.")
         return
 
     tasks_list = []
-    for task in tasks[user_id]:
-        tasks_list.append(f"📝 {task['task_text']} ({priority_translation[task['priority']]})\n   👤 Призначено: {task['assigned_by']}")
+    for task in user_tasks:
+        tasks_list.append(f"📝 {task.task_text} ({task.priority.label})\n   👤 Призначено: {task.assigned_by}")
     await update.message.reply_text("Ваші активні завдання:\n\n" + "\n".join(tasks_list))
 
+# Команда /assigned: завдання, які користувач призначив іншим
+async def show_assigned_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.message.chat.type != "private":
+        await update.message.reply_text("Будь ласка, напишіть мені в приватні повідомлення, щоб переглянути завдання.")
+        return
+
+    assigned_tasks = store.tasks_assigned_by(update.effective_user.id)
+    if not assigned_tasks:
+        await update.message.reply_text("Ви не призначили жодного активного завдання.")
+        return
+
+    tasks_list = []
+    for task in assigned_tasks:
+        assignee = store.get_user(task.assignee_id)
+        assignee_name = assignee.username if assignee else f"Користувач {task.assignee_id}"
+        tasks_list.append(f"📝 {task.task_text} ({task.priority.label})\n   👤 Виконавець: {assignee_name}")
+    await update.message.reply_text("Завдання, призначені вами:\n\n" + "\n".join(tasks_list))
+
+# Команда /timezone: перегляд або зміна часового поясу (наприклад, /timezone Europe/Warsaw)
+async def set_timezone(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.message.chat.type != "private":
+        await update.message.reply_text("Будь ласка, напишіть мені в приватні повідомлення, щоб змінити налаштування.")
+        return
+
+    user = ensure_user(update.effective_user)
+    if not context.args:
+        local_time = datetime.now(user.hours.zone).strftime('%H:%M')
+        await update.message.reply_text(
+            f"Ваш часовий пояс: {user.tz} (зараз {local_time}).\n"
+            f"Щоб змінити, надішліть /timezone <пояс>, наприклад /timezone {DEFAULT_TIMEZONE}"
+        )
+        return
+
+    tz = context.args[0]
+    try:
+        ZoneInfo(tz)
+    # OSError — назва каталогу в базі поясів, наприклад "Europe"
+    except (ZoneInfoNotFoundError, ValueError, OSError):
+        await update.message.reply_text(f"Невідомий часовий пояс: {tz}. Приклад: {DEFAULT_TIMEZONE}")
+        return
+
+    async with store_lock(user.id):
+        user.tz = tz
+        store.register_user(user)
+        reschedule_user(user.id)
+    await update.message.reply_text(f"Часовий пояс змінено на {tz}.")
+
+# Команда /hours: перегляд або зміна робочих годин (наприклад, /hours 09:00-18:00)
+async def set_hours(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.message.chat.type != "private":
+        await update.message.reply_text("Будь ласка, напишіть мені в приватні повідомлення, щоб змінити налаштування.")
+        return
+
+    user = ensure_user(update.effective_user)
+    if not context.args:
+        await update.message.reply_text(
+            f"Нагадування надходять з {user.work_start:%H:%M} до {user.work_end:%H:%M} ({user.tz}).\n"
+            f"Щоб змінити, надішліть /hours <початок>-<кінець>, наприклад /hours 09:00-18:00"
+        )
+        return
+
+    try:
+        work_start, work_end = parse_hours("".join(context.args))
+    except ValueError:
+        await update.message.reply_text("Не вдалося розібрати робочі години. Приклад: /hours 09:00-18:00")
+        return
+
+    async with store_lock(user.id):
+        user.work_start = work_start
+        user.work_end = work_end
+        store.register_user(user)
+        reschedule_user(user.id)
+    await update.message.reply_text(f"Робочі години змінено: з {work_start:%H:%M} до {work_end:%H:%M}.")
+
+# Розбір "9-18" або "09:00-18:30" у пару time; кінець має бути пізніше за початок
+def parse_hours(text):
+    bounds = []
+    for value in text.split('-'):
+        hour, _, minute = value.strip().partition(':')
+        bounds.append(time(int(hour), int(minute or 0)))
+    work_start, work_end = bounds
+    if work_start >= work_end:
+        raise ValueError(text)
+    return work_start, work_end
+
 # Команда /completetask
 async def complete_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     if update.message.chat.type != "private":
         await update.message.reply_text("Будь ласка, напишіть мені в приватні повідомлення, щоб завершити завдання.")
         return
 
     user_id = update.effective_user.id
-    if user_id not in tasks or not tasks[user_id]:
+    user_tasks = store.tasks_for(user_id)
+    if not user_tasks:
         await update.message.reply_text("У вас немає активних завдань.")
         return
 
     keyboard = []
-    for index, task in enumerate(tasks[user_id]):
-        keyboard.append([InlineKeyboardButton(f"{task['task_text']} ({priority_translation[task['priority']]})", callback_data=f"complete_{index}")])
+    for task in user_tasks:
+        keyboard.append([InlineKeyboardButton(f"{task.task_text} ({task.priority.label})", callback_data=f"finish_{task.id}")])
     reply_markup = InlineKeyboardMarkup(keyboard)
     await update.message.reply_text("Оберіть завдання для завершення:", reply_markup=reply_markup)
 
 # Команда "Не можу виконати"
 async def cannot_complete_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     if update.message.chat.type != "private":
         await update.message.reply_text("Будь ласка, напишіть мені в приватні повідомлення, щоб використати цю команду.")
         return
 
     user_id = update.effective_user.id
-    if user_id not in tasks or not tasks[user_id]:
+    user_tasks = store.tasks_for(user_id)
+    if not user_tasks:
         await update.message.reply_text("У вас немає активних завдань.")
         return
 
     keyboard = []
-    for index, task in enumerate(tasks[user_id]):
-        keyboard.append([InlineKeyboardButton(f"{task['task_text']} ({priority_translation[task['priority']]})", callback_data=f"cannot_complete_{index}")])
+    for task in user_tasks:
+        keyboard.append([InlineKeyboardButton(f"{task.task_text} ({task.priority.label})", callback_data=f"decline_{task.id}")])
     reply_markup = InlineKeyboardMarkup(keyboard)
     await update.message.reply_text("Оберіть завдання, яке ви не можете виконати:", reply_markup=reply_markup)
 
 # Обробник текстових повідомлень (для кнопок головного меню)
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     if update.message.chat.type != "private":
         return
 
@@ -156,39 +318,41 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await show_tasks(update, context)
     elif text == '🚫 Не можу виконати':
         await cannot_complete_task(update, context)
+    elif text == '📤 Призначені мною':
+        await show_assigned_tasks(update, context)
     else:
         user_state = context.user_data.get('state')
-        if user_state == STATE_ENTER_TASK:
+        if user_state == STATE_SELECT_USER:
+            # Пошук виконавця за початком імені
+            prefix = update.message.text.strip()
+            context.user_data['assign_prefix'] = prefix
+            entries, _ = directory.page(prefix)
+            text = f"Користувачі, що починаються на «{prefix}»:" if entries else f"Не знайдено користувачів на «{prefix}». Оберіть себе або введіть інший запит:"
+            await update.message.reply_text(text, reply_markup=assignee_keyboard(update.effective_user.id, prefix))
+        elif user_state == STATE_ENTER_TASK:
             task_text = update.message.text
             context.user_data['task_text'] = task_text
-            keyboard = [
-                [InlineKeyboardButton("Терміново", callback_data='urgent')],
-                [InlineKeyboardButton("Середній", callback_data='medium')],
-                [InlineKeyboardButton("Низький", callback_data='low')]
-            ]
+            keyboard = [[InlineKeyboardButton(priority.label, callback_data=priority.value)] for priority in Priority]
             reply_markup = InlineKeyboardMarkup(keyboard)
             await update.message.reply_text("Оберіть пріоритет завдання:", reply_markup=reply_markup)
             context.user_data['state'] = STATE_SELECT_PRIORITY
         elif user_state == STATE_CANNOT_COMPLETE:
             reason = update.message.text
-            task_index = context.user_data.get('cannot_complete_task_index')
-            if task_index is not None:
+            task_id = context.user_data.get('cannot_complete_task_id')
+            if task_id is not None:
                 user_id = update.effective_user.id
-                if user_id in tasks and 0 <= task_index < len(tasks[user_id]):
-                    task = tasks[user_id][task_index]
-                    assigned_by_id = task['assigned_by_id']
-                    try:
-                        await context.bot.send_message(
-                            chat_id=assigned_by_id,
-                            text=f"🚫 Користувач @{update.effective_user.username if update.effective_user.username else update.effective_user.id} не може виконати завдання:\n\n"
-                                 f"📝 Завдання: {task['task_text']}\n"
-                                 f"🚦 Пріоритет: {priority_translation[task['priority']]}\n"
-                                 f"📌 Причина: {reason}"
-                        )
-                    except Exception as e:
-                        logger.error(f"Не вдалося надіслати повідомлення користувачу {assigned_by_id}: {e}")
-                    tasks[user_id].pop(task_index)
-                    update_data()  # Оновлення даних у файлі
+                async with store_lock(user_id):
+                    task = store.get_task(user_id, task_id)
+                    if task is not None:
+                        store.drop_task(user_id, task_id)
+                        cancel_reminder_if_done(user_id, task.priority)
+                if task is not None:
+                    assigned_by_id = task.assigned_by_id
+                    templates.forget(task_id)
+                    outbox.send(
+                        assigned_by_id,
+                        templates.task_declined(update.effective_user.username or update.effective_user.id, task, reason)
+                    )
                     await update.message.reply_text("Завдання видалено через неможливість виконання.")
                 else:
                     await update.message.reply_text("Помилка: завдання не знайдено.")
@@ -204,219 +368,566 @@ async def add_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Додавання користувача до user_data, якщо його там немає
     user = update.effective_user
-    if user.id not in user_data:
-        user_data[user.id] = {
-            'username': user.username if user.username else f"Користувач {user.id}",
-            'chat_id': user.id
-        }
-        update_data()  # Оновлення даних у файлі
+    if not store.has_user(user.id):
+        register_user(user.id, user.username if user.username else f"Користувач {user.id}")
+
+    context.user_data['assign_prefix'] = ''
+    await update.message.reply_text(
+        "Оберіть користувача, якому хочете призначити завдання, або введіть початок імені для пошуку:",
+        reply_markup=assignee_keyboard(user.id)
+    )
+    context.user_data['state'] = STATE_SELECT_USER
 
+# Дочитування користувачів, зареєстрованих іншими процесами
+def refresh_directory():
+    global directory_marker
+    users, directory_marker = store.users_since(directory_marker)
+    for user in users:
+        directory.add(user.id, user.username)
+
+# Сторінка вибору виконавця з навігацією вперед/назад
+def assignee_keyboard(user_id, prefix='', page=0):
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+    if leader is not None:
+        refresh_directory()
+    entries, has_more = directory.page(prefix, page)
     keyboard = [
-        [InlineKeyboardButton("Собі", callback_data=f"assign_{update.effective_user.id}")]
+        [InlineKeyboardButton("Собі", callback_data=f"assign_{user_id}")]
     ]
-    for user_id, data in user_data.items():
-        if user_id != update.effective_user.id:
-            username = data['username'] if data['username'] else f"Користувач {user_id}"
-            keyboard.append([InlineKeyboardButton(username, callback_data=f"assign_{user_id}")])
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text("Оберіть користувача, якому хочете призначити завдання:", reply_markup=reply_markup)
-    context.user_data['state'] = STATE_SELECT_USER
+    for entry_user_id, username in entries:
+        if entry_user_id != user_id:
+            keyboard.append([InlineKeyboardButton(username, callback_data=f"assign_{entry_user_id}")])
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"apage_{page - 1}"))
+    if has_more:
+        navigation.append(InlineKeyboardButton("Далі ➡️", callback_data=f"apage_{page + 1}"))
+    if navigation:
+        keyboard.append(navigation)
+    return InlineKeyboardMarkup(keyboard)
+
+# Користувач зі сховища; реєструється, якщо його там ще немає
+def ensure_user(telegram_user):
+    if not store.has_user(telegram_user.id):
+        register_user(telegram_user.id, telegram_user.username if telegram_user.username else f"Користувач {telegram_user.id}")
+    return store.get_user(telegram_user.id)
+
+# Реєстрація користувача в сховищі та в індексі вибору виконавця
+def register_user(user_id, username):
+    store.register_user(User(user_id, username))
+    directory.add(user_id, username)
+
+# Блокування частини сховища, що належить користувачу
+def store_lock(user_id):
+    if processor is None:
+        return contextlib.nullcontext()
+    return processor.lock_for(user_id)
+
+# Робочі години користувача (типові, якщо його ще немає у сховищі)
+def working_hours(user_id):
+    user = store.get_user(user_id)
+    return user.hours if user is not None else WorkingHours(DEFAULT_TIMEZONE, WORK_START, WORK_END)
+
+# Розклад нагадувань веде лише один процес: єдиний у звичайному режимі або лідер
+def runs_scheduler():
+    return leader is None or leader.is_leader
+
+# Планування нагадувань для нового завдання
+def schedule_reminder(user_id, priority, now=None):
+    if not runs_scheduler():
+        return
+    now = now or datetime.now(timezone.utc)
+    hours = working_hours(user_id)
+    if priority is Priority.LOW:
+        # Щоденне нагадування не зсувається новими завданнями
+        if (user_id, priority) not in reminders:
+            reminders.schedule(user_id, priority, next_due(priority, now, hours))
+    else:
+        # Перше нагадування одразу (або на початку робочого дня), далі — з інтервалом пріоритету
+        reminders.schedule(user_id, priority, within_hours(hours, now))
 
-# Функція для очищення старих нагадувань
-def clear_old_jobs(job_queue, chat_id, name):
-    for job in job_queue.get_jobs_by_name(name):
-        if job.chat_id == chat_id:
-            job.schedule_removal()
+# Перенесення запланованих нагадувань користувача після зміни його поясу чи годин
+def reschedule_user(user_id, now=None):
+    if not runs_scheduler():
+        return
+    now = now or datetime.now(timezone.utc)
+    hours = working_hours(user_id)
+    for priority in Priority:
+        due = reminders.due_at(user_id, priority)
+        if due is None:
+            continue
+        if priority in PRIORITY_INTERVALS:
+            reminders.schedule(user_id, priority, within_hours(hours, max(due, now)))
+        else:
+            reminders.schedule(user_id, priority, next_window_open(hours, now))
 
-# Відновлення нагадувань після перезапуску бота
+# Скасування нагадувань, якщо завдань з цим пріоритетом не залишилось
+def cancel_reminder_if_done(user_id, priority):
+    if runs_scheduler() and not store.tasks_for(user_id, priority):
+        reminders.cancel(user_id, priority)
+
+# Відновлення нагадувань після перезапуску бота: один прохід по сховищу,
+# один розклад на (користувач, пріоритет) у фазі останнього надісланого нагадування.
+# Розклади додаються пакетами, між якими цикл подій обробляє оновлення, що вже надійшли;
+# ключі, які за цей час запланували обробники, не перезаписуються.
 async def restore_reminders():
-    for user_id, user_tasks in tasks.items():
-        for task in user_tasks:
-            priority = task['priority']
-            chat_id = user_id
-            if priority == 'urgent':
-                application.job_queue.run_repeating(
-                    remind_task, interval=3600, first=0, chat_id=chat_id, data=chat_id, name='urgent'
-                )
-            elif priority == 'medium':
-                application.job_queue.run_repeating(
-                    remind_task, interval=21600, first=0, chat_id=chat_id, data=chat_id, name='medium'
-                )
-            elif priority == 'low':
-                reminder_time = time(7, 0, 0)
-                application.job_queue.run_daily(
-                    remind_task, time=reminder_time, chat_id=chat_id, data=chat_id, name='low'
-                )
+    global task_marker
+    started = perf_counter()
+    now = datetime.now(timezone.utc)
+    keys = set()
+    task_count = 0
+    for task in store.all_tasks():
+        keys.add((task.assignee_id, task.priority))
+        task_marker = max(task_marker, task.id)
+        task_count += 1
+
+    last_fired = store.reminders_last_fired()
+    user_hours = {user.id: user.hours for user in store.users()}
+    default_hours = WorkingHours(DEFAULT_TIMEZONE, WORK_START, WORK_END)
+    items = []
+    restored = 0
+    for user_id, priority in keys:
+        if (user_id, priority) in reminders:
+            continue
+        hours = user_hours.get(user_id, default_hours)
+        fired_at = last_fired.get((user_id, priority))
+        if fired_at is not None:
+            # Прострочене нагадування надсилається один раз на першому такті в робочий час
+            last = datetime.fromtimestamp(fired_at, timezone.utc)
+            due = within_hours(hours, max(next_due(priority, last, hours), now))
+        else:
+            # Без історії не надсилаємо всім одразу після старту
+            due = next_due(priority, now, hours)
+        items.append((user_id, priority, due))
+        if len(items) >= RESTORE_BATCH:
+            reminders.schedule_many(items)
+            restored += len(items)
+            items = []
+            await asyncio.sleep(0)
+    reminders.schedule_many(items)
+    restored += len(items)
+
+    elapsed = perf_counter() - started
+    logger.info(f"Відновлено {restored} розкладів нагадувань для {task_count} завдань за {elapsed * 1000:.1f} мс")
+    return restored, task_count, elapsed
 
 # Обробник вибору користувача, пріоритету або завершення завдання
 async def button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    from telegram import InlineKeyboardMarkup
     query = update.callback_query
     await query.answer()
-    if query.data.startswith("assign_"):
+    if query.data.startswith("apage_"):
+        page = int(query.data.split("_")[1])
+        prefix = context.user_data.get('assign_prefix', '')
+        await query.edit_message_reply_markup(reply_markup=assignee_keyboard(query.from_user.id, prefix, page))
+    elif query.data.startswith("assign_"):
         assigned_user_id = int(query.data.split("_")[1])
         context.user_data['assigned_user'] = assigned_user_id
         await query.edit_message_text(text="Введіть текст завдання:")
         context.user_data['state'] = STATE_ENTER_TASK
-    elif query.data.startswith("complete_"):
-        index = int(query.data.split("_")[1])
-        user_id = query.from_user.id
-        if user_id in tasks and 0 <= index < len(tasks[user_id]):
-            completed_task = tasks[user_id].pop(index)
-            update_data()  # Оновлення даних у файлі
-            await query.edit_message_text(text=f"Завдання завершено: {completed_task['task_text']} ({priority_translation[completed_task['priority']]})")
-            assigned_by_id = completed_task['assigned_by_id']
-            if assigned_by_id in user_data:
-                assigned_by_username = user_data[assigned_by_id]['username']
-                try:
-                    await context.bot.send_message(
-                        chat_id=assigned_by_id,
-                        text=f"✅ Завдання, яке ви призначили для @{query.from_user.username if query.from_user.username else query.from_user.id}, виконано:\n\n"
-                             f"📝 Завдання: {completed_task['task_text']}\n"
-                             f"🚦 Пріоритет: {priority_translation[completed_task['priority']]}"
-                    )
-                except Exception as e:
-                    logger.error(f"Не вдалося надіслати повідомлення користувачу {assigned_by_id}: {e}")
+    elif query.data.startswith(("complete_", "cannot_complete_")):
+        # Кнопки, надіслані до переходу на id завдань, містять позицію у списку, а не id
+        await query.edit_message_text(text="Помилка: завдання не знайдено.")
+    elif query.data.startswith("finish_"):
+        task_id = int(query.data.split("_")[1])
+        completed_task = await finish_task(query.from_user, task_id)
+        if completed_task is not None:
+            await query.edit_message_text(text=f"Завдання завершено: {completed_task.task_text} ({completed_task.priority.label})")
         else:
             await query.edit_message_text(text="Помилка: завдання не знайдено.")
-    elif query.data.startswith("cannot_complete_"):
-        index = int(query.data.split("_")[2])
+    elif query.data.startswith("done_"):
+        # Кнопка з дайджесту: прибираємо лише її, решта дайджесту лишається
+        task_id = int(query.data.split("_")[1])
+        await finish_task(query.from_user, task_id)
+        if query.message.reply_markup is not None:
+            keyboard = [row for row in query.message.reply_markup.inline_keyboard if row[0].callback_data != query.data]
+            await query.edit_message_reply_markup(reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None)
+    elif query.data.startswith("decline_"):
+        task_id = int(query.data.split("_")[1])
         user_id = query.from_user.id
-        if user_id in tasks and 0 <= index < len(tasks[user_id]):
-            context.user_data['cannot_complete_task_index'] = index
+        if store.get_task(user_id, task_id) is not None:
+            context.user_data['cannot_complete_task_id'] = task_id
             await query.edit_message_text(text="Будь ласка, введіть причину, чому ви не можете виконати це завдання:")
             context.user_data['state'] = STATE_CANNOT_COMPLETE
         else:
             await query.edit_message_text(text="Помилка: завдання не знайдено.")
     else:
-        priority = query.data
-        context.user_data['priority'] = priority
+        priority = Priority(query.data)
+        context.user_data['priority'] = query.data
         assigned_user = context.user_data['assigned_user']
         task_text = context.user_data['task_text']
 
-        # Перевірка, чи існує користувач у user_data
-        if assigned_user not in user_data:
-            user_data[assigned_user] = {
-                'username': f"Користувач {assigned_user}",  # Замінне значення, якщо username недоступний
-                'chat_id': assigned_user
-            }
-            update_data()  # Оновлення даних у файлі
-
-        if assigned_user not in tasks:
-            tasks[assigned_user] = []
-
-        tasks[assigned_user].append({
-            'task_text': task_text,
-            'priority': priority,
-            'assigned_by': f"@{query.from_user.username}" if query.from_user.username else f"Користувач {query.from_user.id}",
-            'assigned_by_id': query.from_user.id
-        })
-        update_data()  # Оновлення даних у файлі
+        async with store_lock(assigned_user):
+            # Перевірка, чи існує користувач у user_data
+            if not store.has_user(assigned_user):
+                register_user(assigned_user, f"Користувач {assigned_user}")  # Замінне значення, якщо username недоступний
 
-        try:
-            await context.bot.send_message(
-                chat_id=assigned_user,
-                text=f"🎯 Вам призначено нове завдання:\n\n"
-                     f"📝 Завдання: {task_text}\n"
-                     f"🚦 Пріоритет: {priority_translation[priority]}\n"
-                     f"👤 Призначено: @{query.from_user.username if query.from_user.username else query.from_user.id}\n\n"
-                     f"Нагадування будуть надходити у приватні повідомлення."
-            )
-        except Exception as e:
-            logger.error(f"Не вдалося надіслати повідомлення користувачу: {e}")
-
-        # Додавання нагадувань з очищенням старих
-        if priority == 'urgent':
-            clear_old_jobs(context.job_queue, assigned_user, 'urgent')  # Очищення старих нагадувань
-            context.job_queue.run_repeating(remind_task, interval=3600, first=0, chat_id=assigned_user, data=assigned_user, name='urgent')
-        elif priority == 'medium':
-            clear_old_jobs(context.job_queue, assigned_user, 'medium')  # Очищення старих нагадувань
-            context.job_queue.run_repeating(remind_task, interval=21600, first=0, chat_id=assigned_user, data=assigned_user, name='medium')
-        elif priority == 'low':
-            clear_old_jobs(context.job_queue, assigned_user, 'low')  # Очищення старих нагадувань
-            reminder_time = time(7, 0, 0)
-            context.job_queue.run_daily(remind_task, time=reminder_time, chat_id=assigned_user, data=assigned_user, name='low')
+            task = store.add_task(Task(
+                assigned_user,
+                task_text,
+                priority,
+                f"@{query.from_user.username}" if query.from_user.username else f"Користувач {query.from_user.id}",
+                query.from_user.id
+            ))
+
+            # Додавання нагадувань (замінює попередній розклад для цього пріоритету)
+            schedule_reminder(assigned_user, priority)
+
+        outbox.send(assigned_user, templates.new_task(task, query.from_user.username or query.from_user.id))
 
         # Використання username з user_data
-        await query.edit_message_text(text=f"Завдання додано для {user_data[assigned_user]['username']} з пріоритетом {priority_translation[priority]}!")
+        await query.edit_message_text(text=f"Завдання додано для {store.get_user(assigned_user).username} з пріоритетом {priority.label}!")
         context.user_data.clear()
 
-# Функція для нагадування
-async def remind_task(context: ContextTypes.DEFAULT_TYPE):
-    job = context.job
-    assigned_user = job.data
-    priority = job.name
-
-    # Поточний час
-    now = datetime.now().time()
-
-    # Робочий час: з 7:00 до 20:00
-    start_time = time(7, 0, 0)
-    end_time = time(19, 59, 59)
-
-    # Перевірка, чи поточний час знаходиться в робочому діапазоні
-    if start_time <= now <= end_time:
-        if assigned_user in tasks and tasks[assigned_user]:
-            for task in tasks[assigned_user]:
-                if task['priority'] == priority:
-                    await context.bot.send_message(
-                        chat_id=context.job.chat_id,
-                        text=f"⏰ Нагадування для {user_data[assigned_user]['username']}:\n\n"
-                             f"📝 Завдання: {task['task_text']}\n"
-                             f"🚦 Пріоритет: {priority_translation[task['priority']]}\n"
-                             f"👤 Призначено: {task['assigned_by']}"
-                    )
-    else:
-        logger.info(f"Нагадування не відправлено, бо зараз поза робочим часом: {now}")
-
-# Ендпоінт для вебхуків
-@app.route('/webhook', methods=['POST'])
-def webhook():
-    update = Update.de_json(request.get_json(force=True), application.bot)
-    application.update_queue.put(update)
-    return 'ok'
+# Завершення завдання виконавцем і сповіщення постановника; None, якщо завдання не знайдено
+async def finish_task(from_user, task_id):
+    user_id = from_user.id
+    async with store_lock(user_id):
+        completed_task = store.complete_task(user_id, task_id)
+        if completed_task is not None:
+            cancel_reminder_if_done(user_id, completed_task.priority)
+            templates.forget(task_id)
+    if completed_task is not None and store.has_user(completed_task.assigned_by_id):
+        outbox.send(completed_task.assigned_by_id, templates.task_completed(from_user.username or from_user.id, completed_task))
+    return completed_task
+
+# Такт планувальника. У режимі кількох процесів кожен процес на кожному такті
+# пробує стати лідером, тож після падіння лідера розсилку підхоплює інший процес.
+async def remind_task():
+    now = datetime.now(timezone.utc)
+    if leader is not None:
+        if not leader.is_leader:
+            if not leader.try_acquire():
+                return
+            logger.info(f"Процес {os.getpid()} став лідером планувальника нагадувань")
+            await restore_reminders()
+        else:
+            sync_reminders(now)
+    run_reminder_tick(now)
+
+# Узгодження розкладу лідера із завданнями, які додали або закрили інші процеси.
+# Кожне нове завдання планує нагадування так само, як у режимі одного процесу
+# (для термінових — одразу), навіть якщо для його пріоритету розклад уже є.
+def sync_reminders(now):
+    global task_marker
+    for task in store.tasks_since(task_marker):
+        schedule_reminder(task.assignee_id, task.priority, now)
+        task_marker = task.id
+    keys = store.reminder_keys()
+    for user_id, priority in keys - reminders.keys():
+        schedule_reminder(user_id, priority, now)
+    for user_id, priority in reminders.keys() - keys:
+        reminders.cancel(user_id, priority)
+
+# Вибирає всі нагадування, час яких настав на момент now, і розсилає їх пакетом.
+# Ключі групуються за робочими годинами користувачів: перевірка вікна виконується
+# один раз на групу, а групи поза робочим часом переносяться на початок робочого дня цілком.
+def run_reminder_tick(now):
+    due = reminders.pop_due(now)
+    if not due:
+        return
 
-# Новий ендпоінт для пінгування
-@app.route('/ping', methods=['GET'])
-def ping():
-    return 'Pong!', 200
+    user_hours = {}
+    buckets = {}
+    for user_id, priority in due:
+        if user_id not in user_hours:
+            user_hours[user_id] = working_hours(user_id)
+        buckets.setdefault(user_hours[user_id], []).append((user_id, priority))
+
+    fired = []
+    rescheduled = []
+    postponed = 0
+    for hours, keys in buckets.items():
+        if not in_working_hours(hours, now):
+            opening = next_window_open(hours, now)
+            rescheduled += [(user_id, priority, opening) for user_id, priority in keys]
+            postponed += len(keys)
+            continue
+        if REMINDER_MODE == 'digest':
+            priorities_by_user = {}
+            for user_id, priority in keys:
+                priorities_by_user.setdefault(user_id, set()).add(priority)
+            for user_id, priorities in priorities_by_user.items():
+                active, sent = send_digest(user_id, priorities, now)
+                if sent:
+                    fired += [(user_id, priority) for priority in active]
+                # Для пропущеного дайджесту інтервал відраховується від останнього надісланого
+                since = now if sent or not active else digest_sent[user_id][1]
+                for priority in active:
+                    due_at = next_due(priority, since, hours)
+                    rescheduled.append((user_id, priority, due_at if due_at > now else next_due(priority, now, hours)))
+            continue
+        for user_id, priority in keys:
+            if send_reminders(user_id, priority):
+                fired.append((user_id, priority))
+                rescheduled.append((user_id, priority, next_due(priority, now, hours)))
+
+    reminders.schedule_many(rescheduled)
+    if postponed:
+        logger.info(f"{postponed} нагадувань перенесено на початок робочого дня ({len(buckets)} груп робочих годин)")
+    store.mark_reminders_fired(fired, now.timestamp())
+
+# Постановка в чергу нагадувань про всі завдання користувача з пріоритетом priority
+def send_reminders(assigned_user, priority):
+    user_tasks = store.tasks_for(assigned_user, priority)
+    if not user_tasks:
+        return False
+    username = store.get_user(assigned_user).username
+    for task in user_tasks:
+        outbox.send(assigned_user, templates.reminder(username, task), coalesce=True)
+    return True
+
+# Один дайджест на користувача: усі завдання з пріоритетами priorities, від термінових до низьких.
+# Повертає (пріоритети, для яких є завдання, чи надіслано). Дайджест без нових завдань
+# порівняно з попереднім не повторюється, доки не мине найкоротший інтервал серед його пріоритетів.
+def send_digest(user_id, priorities, now):
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+    order = {priority: rank for rank, priority in enumerate(Priority)}
+    user_tasks = sorted(
+        (task for task in store.tasks_for(user_id) if task.priority in priorities),
+        key=lambda task: (order[task.priority], task.id)
+    )
+    if not user_tasks:
+        return set(), False
+    active = {task.priority for task in user_tasks}
+
+    task_ids = frozenset(task.id for task in user_tasks)
+    last = digest_sent.get(user_id)
+    interval = min(PRIORITY_INTERVALS.get(priority, timedelta(days=1)) for priority in active)
+    if last is not None and task_ids <= last[0] and now - last[1] < interval:
+        DIGESTS.inc(result='unchanged')
+        return active, False
+
+    user = store.get_user(user_id)
+    lines = [templates.digest_header(user.username, len(user_tasks))]
+    keyboard = []
+    current = None
+    for task in user_tasks[:DIGEST_MAX_TASKS]:
+        if task.priority is not current:
+            current = task.priority
+            lines.append(templates.DIGEST_SECTIONS[current])
+        lines.append(templates.digest_line(task))
+        keyboard.append([InlineKeyboardButton(f"✅ {task.task_text[:40]}", callback_data=f"done_{task.id}")])
+    if len(user_tasks) > DIGEST_MAX_TASKS:
+        lines.append(f"\n…і ще {len(user_tasks) - DIGEST_MAX_TASKS}. Повний список — «📋 Мої завдання».")
+    outbox.send(user_id, "\n".join(lines), reply_markup=InlineKeyboardMarkup(keyboard))
+    digest_sent[user_id] = (task_ids, now)
+    DIGESTS.inc(result='sent')
+    return active, True
 
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     logger.error("Exception while handling an update:", exc_info=context.error)
 
-def initialize_bot():
+# Запуск черги вихідних повідомлень
+async def post_init(app):
+    global outbox
+    from dispatcher import GLOBAL_RATE, OutboundDispatcher
+    # Ліміт Telegram спільний для бота, тож ділиться між процесами
+    outbox = OutboundDispatcher(app.bot, global_rate=GLOBAL_RATE / WORKER_PROCESSES if leader is not None else GLOBAL_RATE)
+    outbox.start()
+
+# Такт планувальника нагадувань раз на REMINDER_TICK секунд
+async def reminder_loop():
+    tick = instrument("remind_task")(remind_task)
+    while True:
+        try:
+            await tick()
+        except Exception:
+            logger.exception("Помилка такту нагадувань")
+        await asyncio.sleep(REMINDER_TICK)
+
+# Важкі частини запуску, що виконуються в окремому потоці: імпорт telegram,
+# читання сховища й побудова індексу користувачів
+def load_telegram():
+    import telegram.ext  # noqa: F401
+
+def load_store():
+    loaded = load_data()
+    return loaded, UserDirectory(loaded.users())
+
+# Оновлення з вебхука. Поки бот запускається, тіла оновлень лише накопичуються,
+# а в Update розбираються вже після імпорту telegram (див. warm_up)
+def enqueue_update(data):
+    if not ready.is_set():
+        early_updates.append(data)
+        return
+    from telegram import Update
+    processor.put(Update.de_json(data, application.bot))
+
+# Фонова частина запуску. HTTP-сервер уже відповідає на /ping і /health і приймає вебхуки,
+# а тут імпортується telegram, завантажується сховище та ініціалізується Bot API.
+# Відновлення нагадувань і встановлення вебхука йдуть уже після готовності (ready).
+async def warm_up(make_request=None):
+    global store, directory, processor, reminder_loop_task
+    # Обидва кроки навантажують процесор, тож паралельні потоки лише змагалися б за GIL;
+    # цикл подій тим часом обслуговує запити
+    await asyncio.to_thread(load_telegram)
+    startup_timings['telegram'] = perf_counter() - IMPORT_STARTED
+    store, directory = await asyncio.to_thread(load_store)
+    startup_timings['store'] = perf_counter() - IMPORT_STARTED
+
+    initialize_bot(make_request() if make_request is not None else None)
+    if leader is not None:
+        processor = SharedStateProcessor(application, store, shard_locks, UPDATE_SHARDS, UPDATE_CONCURRENCY)
+    else:
+        processor = ShardedUpdateProcessor(application, UPDATE_SHARDS, UPDATE_CONCURRENCY)
+    await application.initialize()
+    await post_init(application)
+    await application.start()
+    processor.start()
+
+    from telegram import Update
+    for data in early_updates:
+        try:
+            processor.put(Update.de_json(data, application.bot))
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Некоректне оновлення у вебхуку: {e}")
+    early_updates.clear()
+    ready.set()
+    elapsed = startup_timings['ready'] = perf_counter() - IMPORT_STARTED
+    phases = ", ".join(f"{phase} {seconds:.2f} с" for phase, seconds in startup_timings.items())
+    if elapsed > STARTUP_TARGET:
+        logger.warning(f"Бот готовий за {elapsed:.2f} с — більше за ціль {STARTUP_TARGET} с ({phases})")
+    else:
+        logger.info(f"Бот готовий за {elapsed:.2f} с ({phases})")
+
+    if runs_scheduler():
+        # Вебхук встановлює один процес
+        await application.bot.set_webhook(WEBHOOK_URL, secret_token=WEBHOOK_SECRET)
+        await restore_reminders()
+    startup_timings['restored'] = perf_counter() - IMPORT_STARTED
+    reminder_loop_task = asyncio.create_task(reminder_loop())
+
+# Без сховища чи Bot API процес не може працювати: завершуємо його, щоб платформа
+# (Render, gunicorn) запустила новий, замість того щоб вічно відповідати "starting"
+def startup_done(task):
+    if task.cancelled() or task.exception() is None:
+        return
+    logger.error("Не вдалося запустити бота", exc_info=task.exception())
+    os.kill(os.getpid(), signal.SIGTERM)
+
+# Доставка черги, дописування журналу і завершення фонового ущільнення перед зупинкою
+async def shutdown(app):
+    for task in (startup_task, reminder_loop_task):
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    if processor is not None:
+        await processor.stop()
+    if outbox is not None:
+        await outbox.stop()
+    if profiler is not None:
+        profiler.stop()
+    if leader is not None:
+        # Інший процес стане лідером на своєму наступному такті
+        leader.release()
+        shard_locks.close()
+    if store is not None:
+        store.close()
+
+# Стан для /health
+def health():
+    return {
+        'status': 'ok' if application is not None and application.running else 'starting',
+        'update_queue': processor.qsize() if processor is not None else len(early_updates),
+        'outbox': len(outbox) if outbox is not None else 0,
+        'reminders': len(reminders),
+        'scheduler_leader': runs_scheduler(),
+        'startup': {phase: round(seconds, 3) for phase, seconds in startup_timings.items()},
+    }
+
+# request — власний HTTP-клієнт для Bot API (наприклад, підробний у benchmark.py)
+def initialize_bot(request=None):
     global application
-    TOKEN = "7911352883:AAHiZP7RuhiwCz_ItdMakiQqo23WVxAV_Zw"
-    application = (
-        ApplicationBuilder()
-        .token(TOKEN)
-        .read_timeout(30)
-        .write_timeout(30)
-        .post_init(lambda app: app.job_queue.start())  # Ініціалізація JobQueue
-        .build()
-    )
+    from telegram.ext import ApplicationBuilder, CallbackQueryHandler, CommandHandler, MessageHandler, filters
+    # Такт нагадувань веде reminder_loop, тож JobQueue (і APScheduler) не потрібні
+    builder = ApplicationBuilder().token(TOKEN).job_queue(None)
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    else:
+        builder = builder.read_timeout(30).write_timeout(30)
+    application = builder.build()
 
     # Додавання обробників команд
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-    application.add_handler(CallbackQueryHandler(button))
-
-    # Встановлення JobQueue
-    if application.job_queue:
-        application.job_queue.run_repeating(callback=remind_task, interval=3600, first=0)
+    application.add_handler(CommandHandler("start", instrument("start")(start)))
+    application.add_handler(CommandHandler("assigned", instrument("assigned")(show_assigned_tasks)))
+    application.add_handler(CommandHandler("timezone", instrument("timezone")(set_timezone)))
+    application.add_handler(CommandHandler("hours", instrument("hours")(set_hours)))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, instrument("handle_message")(handle_message)))
+    application.add_handler(CallbackQueryHandler(instrument("button")(button)))
 
     # Обробник помилок
     application.add_error_handler(error_handler)
 
-    # Встановлення вебхука
-    application.run_webhook(
-        listen='0.0.0.0',
-        port=int(os.environ.get('PORT', 5000)),
-        url_path=TOKEN,
-        webhook_url=f'https://reminder-bot-m6pm.onrender.com/{TOKEN}'
+# Запуск бота; cluster=True — один з кількох процесів зі спільним сховищем.
+# ASGI-додаток вебхука повертається одразу, без імпорту telegram і звернень до диска й мережі,
+# а решту запуску виконує warm_up у фоні (startup_task).
+# make_request — функція, що створює власний HTTP-клієнт для Bot API вже після імпорту telegram
+async def start_bot(cluster=False, make_request=None):
+    global leader, shard_locks, profiler, ready, startup_task, WEBHOOK_SECRET
+    if not TOKEN:
+        raise RuntimeError("Не задано TELEGRAM_TOKEN")
+    if cluster:
+        if STORAGE_BACKEND != 'sqlite':
+            raise RuntimeError("Режим кількох процесів потребує STORAGE_BACKEND=sqlite")
+        if not WEBHOOK_SECRET:
+            raise RuntimeError("Режим кількох процесів потребує спільного WEBHOOK_SECRET")
+        leader = LeaderLock(LEADER_LOCK_PATH)
+        if leader.try_acquire():
+            logger.info(f"Процес {os.getpid()} став лідером планувальника нагадувань")
+        shard_locks = ShardLocks(SHARD_LOCK_PATH)
+    if PROFILER_ENABLED:
+        # Профайлер знімає стеки потоку, в якому працює цикл подій, включно з самим запуском
+        profiler = SamplingProfiler(PROFILER_INTERVAL)
+        profiler.start()
+    if not WEBHOOK_SECRET:
+        WEBHOOK_SECRET = secrets.token_urlsafe(32)
+
+    ready = asyncio.Event()
+    startup_task = asyncio.create_task(warm_up(make_request))
+    startup_task.add_done_callback(startup_done)
+    startup_timings['webhook_app'] = perf_counter() - IMPORT_STARTED
+    return create_webhook_app(
+        enqueue_update, WEBHOOK_SECRET, WEBHOOK_PATH, health,
+        metrics=REGISTRY.render, profiler=profiler, admin_token=METRICS_TOKEN,
     )
 
-# Ініціалізація бота при запуску додатку
-initialize_bot()
+async def stop_bot():
+    if application is not None and application.running:
+        await application.stop()
+    await shutdown(application)
+    if application is not None:
+        await application.shutdown()
+
+# Бот і ASGI-сервер вебхука в одному циклі подій
+async def main():
+    config = uvicorn.Config(await start_bot(), host='0.0.0.0', port=PORT, lifespan='off')
+    try:
+        await uvicorn.Server(config).serve()
+    finally:
+        await stop_bot()
+
+# Точка входу для gunicorn з воркерами uvicorn.workers.UvicornWorker (див. gunicorn.conf.py).
+# Кожен процес запускає власний Application у фазі lifespan і приймає будь-які оновлення,
+# а розсилку нагадувань веде лише обраний лідер.
+async def asgi_app(scope, receive, send):
+    global webhook_app
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    webhook_app = await start_bot(cluster=True)
+                except Exception as e:
+                    logger.exception("Не вдалося запустити бота")
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await stop_bot()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    await webhook_app(scope, receive, send)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
\ No newline at end of file
+    asyncio.run(main())
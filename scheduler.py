@@ -0,0 +1,123 @@
+import heapq
+import itertools
+from datetime import datetime, timedelta
+
+from models import Priority
+
+# Інтервали повторення нагадувань за пріоритетом
+PRIORITY_INTERVALS = {
+    Priority.URGENT: timedelta(hours=1),
+    Priority.MEDIUM: timedelta(hours=6),
+}
+
+
+# Усі моменти часу в планувальнику — datetime з часовим поясом,
+# а робочі години (models.WorkingHours) задаються в місцевому часі користувача
+
+def in_working_hours(hours, at):
+    return hours.start <= at.astimezone(hours.zone).time() < hours.end
+
+
+# Найближчий початок робочого дня користувача строго після моменту after
+def next_window_open(hours, after):
+    local = after.astimezone(hours.zone)
+    opening = datetime.combine(local.date(), hours.start, tzinfo=hours.zone)
+    if opening <= local:
+        opening = datetime.combine(local.date() + timedelta(days=1), hours.start, tzinfo=hours.zone)
+    return opening
+
+
+# Момент at, якщо він у робочих годинах, інакше початок наступного робочого дня
+def within_hours(hours, at):
+    return at if in_working_hours(hours, at) else next_window_open(hours, at)
+
+
+# Наступний час нагадування для пріоритету після моменту after.
+# Нагадування з низьким пріоритетом надходять раз на день на початку робочого дня.
+def next_due(priority, after, hours):
+    if priority in PRIORITY_INTERVALS:
+        return within_hours(hours, after + PRIORITY_INTERVALS[priority])
+    return next_window_open(hours, after)
+
+
+# Планувальник нагадувань: одна купа з часами спрацювання за ключем (користувач, пріоритет)
+# замість окремої задачі APScheduler на кожного користувача.
+# Вставка — O(log n), скасування — O(1) (лінива позначка, запис викидається при вибиранні).
+class ReminderScheduler:
+    def __init__(self):
+        self._heap = []
+        self._entries = {}
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def keys(self):
+        return set(self._entries)
+
+    # Кількість запланованих ключів за пріоритетом
+    def counts(self):
+        counts = dict.fromkeys(Priority, 0)
+        for _, priority in self._entries:
+            counts[priority] += 1
+        return counts
+
+    def due_at(self, user_id, priority):
+        entry = self._entries.get((user_id, priority))
+        return entry[0] if entry is not None else None
+
+    def schedule(self, user_id, priority, due):
+        key = (user_id, priority)
+        self.cancel(user_id, priority)
+        entry = [due, next(self._counter), key, True]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+
+    # Пакет розкладів. Пакет, не менший за купу (початкове відновлення), додається
+    # однією побудовою купи O(n + k); менший (перепланування на такті) — вставками O(k log n)
+    def schedule_many(self, items):
+        items = list(items)
+        bulk = len(items) >= len(self._heap)
+        for user_id, priority, due in items:
+            key = (user_id, priority)
+            self._invalidate(key)
+            entry = [due, next(self._counter), key, True]
+            self._entries[key] = entry
+            if bulk:
+                self._heap.append(entry)
+            else:
+                heapq.heappush(self._heap, entry)
+        if bulk:
+            heapq.heapify(self._heap)
+        self._drop_cancelled()
+
+    def cancel(self, user_id, priority):
+        if self._invalidate((user_id, priority)) is not None:
+            self._drop_cancelled()
+
+    def _invalidate(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry[3] = False
+        return entry
+
+    # Не даємо скасованим записам розростатися в купі
+    def _drop_cancelled(self):
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [item for item in self._heap if item[3]]
+            heapq.heapify(self._heap)
+
+    # Вибирає всі ключі, час яких настав; наступне спрацювання планує викликач
+    # (воно залежить від робочих годин користувача)
+    def pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if not entry[3]:
+                continue
+            due.append(entry[2])
+            del self._entries[entry[2]]
+        return due
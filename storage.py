@@ -0,0 +1,521 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from metrics import STORE_WRITE_DURATION
+from models import Priority, Task, User, SCHEMA_VERSION, decode_state, dump_state, empty_state, json_loads, put_task
+
+logger = logging.getLogger(__name__)
+
+# Кількість записів у журналі, після якої запускається ущільнення у знімок
+COMPACT_THRESHOLD = 1000
+
+
+# Застосування одного запису журналу до стану в пам'яті
+def apply_record(state, record):
+    op = record["op"]
+    user_id = record.get("user_id")
+    if op == "user_registered":
+        user = User.from_dict(record["user"], user_id)
+        state["users"][user.id] = user
+    elif op == "task_added":
+        put_task(state, Task.from_dict(record["task"], user_id))
+    elif op in ("task_completed", "task_dropped"):
+        user_tasks = state["tasks"].get(user_id, {})
+        task_id = record.get("task_id")
+        if task_id is None:
+            # Старий формат запису з позицією у списку
+            ids = list(user_tasks)
+            task_id = ids[record["index"]] if 0 <= record["index"] < len(ids) else None
+        task = user_tasks.pop(task_id, None)
+        if not user_tasks:
+            state["tasks"].pop(user_id, None)
+        return task
+    elif op == "reminders_fired":
+        for fired_user_id, priority in record["keys"]:
+            state["reminders"][(fired_user_id, Priority(priority))] = record["fired_at"]
+    else:
+        logger.warning(f"Невідомий запис журналу: {op}")
+    return None
+
+
+# Читання знімка tasks_data.json (будь-якої версії схеми) з диска
+def read_snapshot(path):
+    if not os.path.exists(path):
+        return empty_state()
+    with open(path, 'rb') as file:
+        return decode_state(file.read())
+
+
+# Атомарний запис знімка: тимчасовий файл + os.replace
+def write_snapshot(path, state):
+    tmp_path = path + ".tmp"
+    with STORE_WRITE_DURATION.time(backend='journal', op='snapshot'):
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(dump_state(state), file, ensure_ascii=False)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+
+
+# Програвання журналу поверх стану; записи, що вже увійшли у знімок, пропускаються.
+# Повертає (кількість застосованих записів, позицію кінця останнього цілого рядка в байтах)
+def replay_journal(path, state):
+    if not os.path.exists(path):
+        return 0, 0
+    applied = 0
+    valid_end = 0
+    with open(path, 'rb') as file:
+        for line in file:
+            if not line.endswith(b"\n"):
+                # Обірваний останній запис після аварійного завершення: запис не завершився,
+                # тож і не був підтверджений
+                logger.warning(f"Відкинуто обірваний останній запис у журналі {path}")
+                break
+            valid_end += len(line)
+            try:
+                record = json_loads(line)
+            except ValueError:
+                logger.warning(f"Пропущено пошкоджений запис у журналі {path}")
+                continue
+            if record["seq"] <= state["seq"]:
+                continue
+            if record["seq"] != state["seq"] + 1:
+                logger.warning(f"Пропуск у журналі {path}: втрачено записи {state['seq'] + 1}-{record['seq'] - 1}")
+            apply_record(state, record)
+            state["seq"] = record["seq"]
+            applied += 1
+    return applied, valid_end
+
+
+# Сховище завдань: знімок + журнал операцій, що лише доповнюється.
+# Кожна зміна дописує один рядок у журнал (O(1) замість перезапису всього
+# файлу), а ущільнення у новий знімок виконується у фоновому потоці.
+class JournalStore:
+    def __init__(self, path, compact_threshold=COMPACT_THRESHOLD, fsync=True):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.rotated_path = path + ".journal.1"
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        self._compaction = None
+
+        self.state = read_snapshot(path)
+        replay_journal(self.rotated_path, self.state)
+        self._records, valid_end = replay_journal(self.journal_path, self.state)
+        self.tasks = self.state["tasks"]
+        self.user_data = self.state["users"]
+
+        # Вторинні індекси: id -> завдання, постановник -> {id: завдання}
+        self.by_id = {}
+        self.by_assigner = {}
+        for task in self.all_tasks():
+            self._index_task(task)
+
+        # Обірваний хвіст відрізається, інакше наступний запис опиниться з ним в одному рядку
+        # і пропаде разом з ним, а seq і id завдань будуть видані повторно
+        if os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) > valid_end:
+            os.truncate(self.journal_path, valid_end)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        if os.path.exists(self.rotated_path):
+            # Залишок незавершеного ущільнення з попереднього запуску
+            self._start_compaction()
+        elif self.state["schema"] < SCHEMA_VERSION:
+            # Перезапис знімка старого формату у поточну схему
+            logger.info(f"Міграція {path} зі схеми {self.state['schema']} до {SCHEMA_VERSION}")
+            self.compact()
+
+    # Додавання запису до журналу
+    def _append(self, record):
+        self.state["seq"] += 1
+        record["seq"] = self.state["seq"]
+        with STORE_WRITE_DURATION.time(backend='journal', op=record["op"]):
+            self._journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+        self._records += 1
+        if self._records >= self.compact_threshold:
+            self.compact()
+
+    # Розмір файлів сховища на диску: знімок і журнали
+    def size_bytes(self):
+        return sum(os.path.getsize(path) for path in (self.path, self.journal_path, self.rotated_path) if os.path.exists(path))
+
+    def has_user(self, user_id):
+        return user_id in self.user_data
+
+    def get_user(self, user_id):
+        return self.user_data.get(user_id)
+
+    def users(self):
+        return list(self.user_data.values())
+
+    def _index_task(self, task):
+        self.by_id[task.id] = task
+        self.by_assigner.setdefault(task.assigned_by_id, {})[task.id] = task
+
+    def _unindex_task(self, task):
+        self.by_id.pop(task.id, None)
+        assigned = self.by_assigner.get(task.assigned_by_id)
+        if assigned is not None:
+            assigned.pop(task.id, None)
+            if not assigned:
+                del self.by_assigner[task.assigned_by_id]
+
+    def tasks_for(self, user_id, priority=None):
+        user_tasks = self.tasks.get(user_id, {}).values()
+        if priority is None:
+            return list(user_tasks)
+        return [task for task in user_tasks if task.priority is priority]
+
+    # Завдання з id task_id, якщо воно призначене користувачу user_id
+    def get_task(self, user_id, task_id):
+        return self.tasks.get(user_id, {}).get(task_id)
+
+    # Завдання, які користувач призначив іншим
+    def tasks_assigned_by(self, user_id):
+        return [task for task in self.by_assigner.get(user_id, {}).values() if task.assignee_id != user_id]
+
+    def all_tasks(self):
+        for user_tasks in self.tasks.values():
+            yield from user_tasks.values()
+
+    # Пари (виконавець, пріоритет), для яких є відкриті завдання
+    def reminder_keys(self):
+        return {(task.assignee_id, task.priority) for task in self.all_tasks()}
+
+    # Час останнього нагадування (timestamp) за ключем (користувач, пріоритет)
+    def reminders_last_fired(self):
+        return dict(self.state["reminders"])
+
+    # Один запис журналу на весь такт, а не на кожне нагадування
+    def mark_reminders_fired(self, keys, fired_at):
+        if not keys:
+            return
+        record = {"op": "reminders_fired", "keys": [[user_id, priority.value] for user_id, priority in keys], "fired_at": fired_at}
+        apply_record(self.state, record)
+        self._append(record)
+
+    # Новий користувач або зміна його налаштувань
+    def register_user(self, user):
+        self.user_data[user.id] = user
+        self._append({"op": "user_registered", "user_id": user.id, "user": user.to_dict()})
+
+    # Повертає завдання з присвоєним id
+    def add_task(self, task):
+        put_task(self.state, task)
+        self._index_task(task)
+        self._append({"op": "task_added", "user_id": task.assignee_id, "task": task.to_dict()})
+        return task
+
+    def complete_task(self, user_id, task_id):
+        return self._remove_task("task_completed", user_id, task_id)
+
+    def drop_task(self, user_id, task_id):
+        return self._remove_task("task_dropped", user_id, task_id)
+
+    def _remove_task(self, op, user_id, task_id):
+        task = self.by_id.get(task_id)
+        if task is None or task.assignee_id != user_id:
+            return None
+        record = {"op": op, "user_id": user_id, "task_id": task_id}
+        task = apply_record(self.state, record)
+        self._unindex_task(task)
+        self._append(record)
+        return task
+
+    # Ротація журналу і запуск ущільнення у фоні
+    def compact(self):
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+        if os.path.exists(self.rotated_path):
+            # Попереднє ущільнення не завершилось — спершу доробляємо його
+            self._start_compaction()
+            return
+        self._journal.close()
+        os.replace(self.journal_path, self.rotated_path)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._records = 0
+        self._start_compaction()
+
+    def _start_compaction(self):
+        self._compaction = threading.Thread(target=self._compact_rotated, name="journal-compaction", daemon=True)
+        self._compaction.start()
+
+    # Працює лише з файлами, тому не блокує цикл подій і не чіпає живий стан
+    def _compact_rotated(self):
+        try:
+            state = read_snapshot(self.path)
+            replay_journal(self.rotated_path, state)
+            write_snapshot(self.path, state)
+            os.remove(self.rotated_path)
+        except Exception as e:
+            logger.error(f"Не вдалося ущільнити журнал {self.rotated_path}: {e}")
+
+    def close(self):
+        if self._compaction is not None:
+            self._compaction.join()
+        self._journal.close()
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    chat_id INTEGER NOT NULL,
+    tz TEXT,
+    work_start TEXT,
+    work_end TEXT,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    assignee_id INTEGER NOT NULL,
+    task_text TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    assigned_by TEXT NOT NULL,
+    assigned_by_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_assignee ON tasks (assignee_id, priority);
+CREATE INDEX IF NOT EXISTS tasks_assigner ON tasks (assigned_by_id);
+CREATE INDEX IF NOT EXISTS tasks_priority ON tasks (priority);
+CREATE TABLE IF NOT EXISTS reminders (
+    user_id INTEGER NOT NULL,
+    priority TEXT NOT NULL,
+    last_fired REAL NOT NULL,
+    PRIMARY KEY (user_id, priority)
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+TASK_COLUMNS = "id, assignee_id, task_text, priority, assigned_by, assigned_by_id"
+USER_COLUMNS = "user_id, username, chat_id, tz, work_start, work_end"
+
+# Стовпці, додані до users після першої версії схеми SQLite
+USER_MIGRATIONS = {
+    'tz': "ALTER TABLE users ADD COLUMN tz TEXT",
+    'work_start': "ALTER TABLE users ADD COLUMN work_start TEXT",
+    'work_end': "ALTER TABLE users ADD COLUMN work_end TEXT",
+    'updated_at': "ALTER TABLE users ADD COLUMN updated_at REAL",
+}
+
+# Скільки чекати, поки інший процес завершить запис (секунди). Запити виконуються
+# в потоці циклу подій, тож очікування зупиняє обробку всіх оновлень процесу:
+# записи тривають мілісекунди, і довше чекати немає сенсу
+BUSY_TIMEOUT = 1
+# Відкриття бази (міграція, імпорт із JSON) виконується у фоновому потоці під час запуску
+# і може чекати, поки інший процес імпортує дані
+OPEN_BUSY_TIMEOUT = 60
+
+
+def _user_to_row(user):
+    data = user.to_dict()
+    return (user.id, user.username, user.chat_id, data['tz'], data['work_start'], data['work_end'])
+
+
+def _task_from_row(row):
+    return Task(row[1], row[2], row[3], row[4], row[5], row[0])
+
+
+def _task_to_row(task):
+    return (task.id, task.assignee_id, task.task_text, task.priority.value, task.assigned_by, task.assigned_by_id)
+
+
+# Сховище у SQLite: обробники читають лише потрібні рядки за індексами,
+# тож пам'ять не росте разом з кількістю користувачів.
+# Одне з'єднання на процес (WAL): читання не блокуються, а записи кількох процесів
+# серіалізує сам SQLite (з очікуванням до BUSY_TIMEOUT).
+class SqliteStore:
+    def __init__(self, path, seed_state=None):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=OPEN_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SQLITE_SCHEMA)
+        self._migrate()
+        if seed_state is not None and self._is_empty():
+            self._import_state(seed_state)
+        self._db.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+
+    def _migrate(self):
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(users)")}
+        for column, statement in USER_MIGRATIONS.items():
+            if column not in columns:
+                self._db.execute(statement)
+        self._db.execute("CREATE INDEX IF NOT EXISTS users_updated ON users (updated_at)")
+
+    def _is_empty(self):
+        return self._db.execute("SELECT NOT EXISTS (SELECT 1 FROM users) AND NOT EXISTS (SELECT 1 FROM tasks)").fetchone()[0]
+
+    # Перенесення даних з JSON-сховища при першому запуску. Кілька процесів можуть
+    # одночасно побачити порожню базу, тож порожнеча перевіряється ще раз під блокуванням запису
+    def _import_state(self, state):
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            if not self._is_empty():
+                logger.info(f"Дані вже імпортовано іншим процесом у {self.path}")
+                return
+            self._db.executemany(
+                f"INSERT INTO users ({USER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                [_user_to_row(user) for user in state["users"].values()]
+            )
+            self._db.executemany(
+                f"INSERT INTO tasks ({TASK_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                [_task_to_row(task) for user_tasks in state["tasks"].values() for task in user_tasks.values()]
+            )
+            # Id видалених завдань не використовуються повторно
+            self._db.execute("DELETE FROM sqlite_sequence WHERE name = 'tasks'")
+            self._db.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('tasks', ?)", (state["next_task_id"] - 1,))
+            self._db.executemany(
+                "INSERT INTO reminders (user_id, priority, last_fired) VALUES (?, ?, ?)",
+                [(user_id, priority.value, fired_at) for (user_id, priority), fired_at in state["reminders"].items()]
+            )
+        logger.info(f"Імпортовано {len(state['users'])} користувачів у {self.path}")
+
+    def size_bytes(self):
+        return sum(os.path.getsize(path) for path in (self.path, self.path + "-wal") if os.path.exists(path))
+
+    def has_user(self, user_id):
+        return self._db.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)).fetchone() is not None
+
+    def get_user(self, user_id):
+        row = self._db.execute(f"SELECT {USER_COLUMNS} FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return User(*row) if row is not None else None
+
+    def users(self):
+        return [User(*row) for row in self._db.execute(f"SELECT {USER_COLUMNS} FROM users")]
+
+    # Користувачі, зареєстровані або змінені іншими процесами з моменту since;
+    # повертає ([User, ...], позначку для наступного виклику)
+    def users_since(self, since):
+        rows = self._db.execute(
+            f"SELECT {USER_COLUMNS}, updated_at FROM users WHERE updated_at >= ? ORDER BY updated_at", (since,)
+        ).fetchall()
+        if not rows:
+            return [], since
+        return [User(*row[:-1]) for row in rows], rows[-1][-1]
+
+    def tasks_for(self, user_id, priority=None):
+        if priority is None:
+            rows = self._db.execute(
+                f"SELECT {TASK_COLUMNS} FROM tasks WHERE assignee_id = ? ORDER BY id", (user_id,)
+            )
+        else:
+            rows = self._db.execute(
+                f"SELECT {TASK_COLUMNS} FROM tasks WHERE assignee_id = ? AND priority = ? ORDER BY id",
+                (user_id, priority.value)
+            )
+        return [_task_from_row(row) for row in rows]
+
+    # Завдання з id, більшим за task_id (додані після нього будь-яким процесом)
+    def tasks_since(self, task_id):
+        rows = self._db.execute(f"SELECT {TASK_COLUMNS} FROM tasks WHERE id > ? ORDER BY id", (task_id,))
+        return [_task_from_row(row) for row in rows]
+
+    def get_task(self, user_id, task_id):
+        row = self._db.execute(
+            f"SELECT {TASK_COLUMNS} FROM tasks WHERE id = ? AND assignee_id = ?", (task_id, user_id)
+        ).fetchone()
+        return _task_from_row(row) if row is not None else None
+
+    def tasks_assigned_by(self, user_id):
+        rows = self._db.execute(
+            f"SELECT {TASK_COLUMNS} FROM tasks WHERE assigned_by_id = ? AND assignee_id != ? ORDER BY id",
+            (user_id, user_id)
+        )
+        return [_task_from_row(row) for row in rows]
+
+    def all_tasks(self):
+        for row in self._db.execute(f"SELECT {TASK_COLUMNS} FROM tasks ORDER BY id"):
+            yield _task_from_row(row)
+
+    # Пари (виконавець, пріоритет), для яких є відкриті завдання (за індексом tasks_assignee)
+    def reminder_keys(self):
+        rows = self._db.execute("SELECT DISTINCT assignee_id, priority FROM tasks")
+        return {(row[0], Priority(row[1])) for row in rows}
+
+    def reminders_last_fired(self):
+        rows = self._db.execute("SELECT user_id, priority, last_fired FROM reminders")
+        return {(row[0], Priority(row[1])): row[2] for row in rows}
+
+    def mark_reminders_fired(self, keys, fired_at):
+        if not keys:
+            return
+        with STORE_WRITE_DURATION.time(backend='sqlite', op='reminders_fired'), self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO reminders (user_id, priority, last_fired) VALUES (?, ?, ?)",
+                [(user_id, priority.value, fired_at) for user_id, priority in keys]
+            )
+
+    def register_user(self, user):
+        with STORE_WRITE_DURATION.time(backend='sqlite', op='user_registered'):
+            self._db.execute(
+                f"INSERT OR REPLACE INTO users ({USER_COLUMNS}, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                _user_to_row(user) + (time.time(),)
+            )
+
+    def add_task(self, task):
+        with STORE_WRITE_DURATION.time(backend='sqlite', op='task_added'):
+            cursor = self._db.execute(
+                "INSERT INTO tasks (assignee_id, task_text, priority, assigned_by, assigned_by_id) VALUES (?, ?, ?, ?, ?)",
+                _task_to_row(task)[1:]
+            )
+        task.id = cursor.lastrowid
+        return task
+
+    def complete_task(self, user_id, task_id):
+        return self._remove_task(user_id, task_id)
+
+    def drop_task(self, user_id, task_id):
+        return self._remove_task(user_id, task_id)
+
+    # SELECT і DELETE в одній транзакції: DELETE ... RETURNING потребує SQLite 3.35+
+    def _remove_task(self, user_id, task_id):
+        with STORE_WRITE_DURATION.time(backend='sqlite', op='task_removed'), self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            row = self._db.execute(
+                f"SELECT {TASK_COLUMNS} FROM tasks WHERE id = ? AND assignee_id = ?", (task_id, user_id)
+            ).fetchone()
+            if row is not None:
+                self._db.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+        return _task_from_row(row) if row is not None else None
+
+    # Стан розмови користувача (context.user_data), спільний для всіх процесів
+    def load_conversation(self, user_id):
+        row = self._db.execute("SELECT data FROM conversations WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else {}
+
+    def save_conversation(self, user_id, data):
+        if data:
+            self._db.execute(
+                "INSERT OR REPLACE INTO conversations (user_id, data) VALUES (?, ?)",
+                (user_id, json.dumps(data, ensure_ascii=False))
+            )
+        else:
+            self._db.execute("DELETE FROM conversations WHERE user_id = ?", (user_id,))
+
+    def close(self):
+        self._db.close()
+
+
+# Вибір сховища за змінною оточення STORAGE_BACKEND: journal (типово) або sqlite
+def open_store(data_file, backend='journal', sqlite_path=None):
+    if backend == 'sqlite':
+        sqlite_path = sqlite_path or os.path.splitext(data_file)[0] + ".db"
+        if not os.path.exists(sqlite_path):
+            seed_state = read_snapshot(data_file)
+            replay_journal(data_file + ".journal.1", seed_state)
+            replay_journal(data_file + ".journal", seed_state)
+            return SqliteStore(sqlite_path, seed_state=seed_state)
+        return SqliteStore(sqlite_path)
+    if backend != 'journal':
+        raise ValueError(f"Невідоме сховище: {backend}")
+    return JournalStore(data_file)
@@ -0,0 +1,69 @@
+from models import Priority
+
+# Тексти повідомлень бота. Незмінні частини (рядки з пріоритетом, заголовки розділів
+# дайджесту) готуються один раз при імпорті, а текст нагадування про завдання
+# кешується за id завдання — завдання не змінюються після створення.
+
+PRIORITY_LINES = {priority: f"🚦 Пріоритет: {priority.label}" for priority in Priority}
+DIGEST_SECTIONS = {priority: f"\n🚦 {priority.label}:" for priority in Priority}
+
+# Межа кешу нагадувань; завдання, закриті в інших процесах, не видаляються з нього явно
+REMINDER_CACHE_SIZE = 100000
+_reminders = {}
+
+
+def reminder(username, task):
+    cached = _reminders.get(task.id)
+    if cached is not None and cached[0] == username:
+        return cached[1]
+    text = (
+        f"⏰ Нагадування для {username}:\n\n"
+        f"📝 Завдання: {task.task_text}\n"
+        f"{PRIORITY_LINES[task.priority]}\n"
+        f"👤 Призначено: {task.assigned_by}"
+    )
+    if len(_reminders) >= REMINDER_CACHE_SIZE:
+        _reminders.clear()
+    _reminders[task.id] = (username, text)
+    return text
+
+
+# Завдання закрито — його нагадування більше не знадобиться
+def forget(task_id):
+    _reminders.pop(task_id, None)
+
+
+def new_task(task, assigner):
+    return (
+        f"🎯 Вам призначено нове завдання:\n\n"
+        f"📝 Завдання: {task.task_text}\n"
+        f"{PRIORITY_LINES[task.priority]}\n"
+        f"👤 Призначено: @{assigner}\n\n"
+        f"Нагадування будуть надходити у приватні повідомлення."
+    )
+
+
+def task_completed(assignee, task):
+    return (
+        f"✅ Завдання, яке ви призначили для @{assignee}, виконано:\n\n"
+        f"📝 Завдання: {task.task_text}\n"
+        f"{PRIORITY_LINES[task.priority]}"
+    )
+
+
+def task_declined(assignee, task, reason):
+    return (
+        f"🚫 Користувач @{assignee} не може виконати завдання:\n\n"
+        f"📝 Завдання: {task.task_text}\n"
+        f"{PRIORITY_LINES[task.priority]}\n"
+        f"📌 Причина: {reason}"
+    )
+
+
+def digest_header(username, count):
+    return f"⏰ Нагадування для {username} (завдань: {count})"
+
+
+# Обрізання тримає дайджест у межах 4096 символів повідомлення Telegram
+def digest_line(task):
+    return f"• {task.task_text[:150]} — {task.assigned_by}"
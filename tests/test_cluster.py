@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+pytest.importorskip("telegram")
+
+import reminder_bot as bot
+from models import DEFAULT_TIMEZONE, Priority, Task, User
+from scheduler import ReminderScheduler
+from storage import SqliteStore
+
+
+class Leader:
+    is_leader = True
+
+
+# Нове термінове завдання з іншого процесу нагадується одразу, навіть якщо розклад
+# для цього пріоритету вже є — як у режимі одного процесу
+def test_leader_schedules_tasks_added_by_other_process(tmp_path, monkeypatch):
+    path = str(tmp_path / "tasks_data.db")
+    leader_store, worker_store = SqliteStore(path), SqliteStore(path)
+    now = datetime.now(ZoneInfo(DEFAULT_TIMEZONE)).replace(hour=10, minute=0, second=0, microsecond=0)
+    monkeypatch.setattr(bot, 'store', leader_store)
+    monkeypatch.setattr(bot, 'leader', Leader())
+    monkeypatch.setattr(bot, 'reminders', ReminderScheduler())
+    monkeypatch.setattr(bot, 'task_marker', 0)
+
+    leader_store.register_user(User(1, "@worker"))
+    leader_store.add_task(Task(1, "t1", Priority.URGENT, "@boss", 2))
+    bot.sync_reminders(now)
+    assert bot.reminders.due_at(1, Priority.URGENT) == now
+    bot.reminders.schedule(1, Priority.URGENT, now + timedelta(hours=1))
+
+    later = now + timedelta(minutes=5)
+    worker_store.add_task(Task(1, "t2", Priority.URGENT, "@boss", 2))
+    bot.sync_reminders(later)
+    assert bot.reminders.due_at(1, Priority.URGENT) == later
+    # Уже враховані завдання не зсувають розклад повторно
+    bot.reminders.schedule(1, Priority.URGENT, later + timedelta(hours=1))
+    bot.sync_reminders(later + timedelta(minutes=1))
+    assert bot.reminders.due_at(1, Priority.URGENT) == later + timedelta(hours=1)
+
+    leader_store.close()
+    worker_store.close()
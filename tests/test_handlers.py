@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("telegram")
+
+import reminder_bot as bot
+from models import Priority, Task, User
+from scheduler import ReminderScheduler
+from storage import JournalStore
+
+
+class Outbox:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+class Query:
+    def __init__(self, user_id, data):
+        self.from_user = SimpleNamespace(id=user_id, username="worker")
+        self.data = data
+        self.edits = []
+
+    async def answer(self):
+        pass
+
+    async def edit_message_text(self, text):
+        self.edits.append(text)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = JournalStore(str(tmp_path / "tasks_data.json"), fsync=False)
+    monkeypatch.setattr(bot, 'store', store)
+    monkeypatch.setattr(bot, 'outbox', Outbox())
+    monkeypatch.setattr(bot, 'reminders', ReminderScheduler())
+    yield store
+    store.close()
+
+
+def press(user_id, data):
+    query = Query(user_id, data)
+    context = SimpleNamespace(user_data={})
+    asyncio.run(bot.button(SimpleNamespace(callback_query=query), context))
+    return query.edits
+
+
+# Кнопки зі старою позицією у списку не завершують завдання з таким самим id
+def test_old_index_buttons_do_not_complete_tasks(store):
+    store.register_user(User(1, "@worker"))
+    first = store.add_task(Task(1, "t1", Priority.LOW, "@boss", 2))
+    store.add_task(Task(1, "t2", Priority.LOW, "@boss", 2))
+
+    assert press(1, f"complete_{first.id}") == ["Помилка: завдання не знайдено."]
+    assert press(1, f"cannot_complete_{first.id}") == ["Помилка: завдання не знайдено."]
+    assert len(store.tasks_for(1)) == 2
+
+    assert press(1, f"finish_{first.id}") == ["Завдання завершено: t1 (Низький)"]
+    assert [task.task_text for task in store.tasks_for(1)] == ["t2"]
+
+
+class Message:
+    def __init__(self):
+        self.chat = SimpleNamespace(type="private")
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+@pytest.mark.parametrize("tz", ["Europe", "Nope/Zone", "../etc/passwd"])
+def test_unknown_timezone_is_rejected(store, tz):
+    store.register_user(User(1, "@worker"))
+    message = Message()
+    update = SimpleNamespace(message=message, effective_user=SimpleNamespace(id=1, username="worker"))
+    asyncio.run(bot.set_timezone(update, SimpleNamespace(args=[tz])))
+    assert message.replies == [f"Невідомий часовий пояс: {tz}. Приклад: {bot.DEFAULT_TIMEZONE}"]
+    assert store.get_user(1).tz == bot.DEFAULT_TIMEZONE
@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta, timezone
+
+from models import Priority
+from scheduler import ReminderScheduler
+
+START = datetime(2024, 1, 1, 9, 0, tzinfo=timezone.utc)
+
+
+def test_pop_due_returns_keys_in_time_order():
+    reminders = ReminderScheduler()
+    reminders.schedule_many((user_id, Priority.URGENT, START + timedelta(minutes=user_id)) for user_id in range(100))
+    # Невеликий пакет поверх наявної купи (перепланування на такті)
+    reminders.schedule_many([(500, Priority.URGENT, START + timedelta(seconds=30)), (3, Priority.URGENT, START + timedelta(hours=2))])
+
+    due = reminders.pop_due(START + timedelta(minutes=5))
+    assert due == [(0, Priority.URGENT), (500, Priority.URGENT)] + [(user_id, Priority.URGENT) for user_id in (1, 2, 4, 5)]
+    assert reminders.due_at(3, Priority.URGENT) == START + timedelta(hours=2)
+
+
+# Перезаписані розклади не накопичуються в купі
+def test_rescheduling_keeps_heap_bounded():
+    reminders = ReminderScheduler()
+    reminders.schedule_many((user_id, Priority.MEDIUM, START) for user_id in range(100))
+    for tick in range(50):
+        reminders.schedule_many((user_id, Priority.MEDIUM, START + timedelta(hours=tick)) for user_id in range(10))
+    assert len(reminders) == 100
+    assert len(reminders._heap) <= 2 * len(reminders) + 64
@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("uvicorn")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Імпорт модуля бота не тягне telegram: його завантажує warm_up уже після старту сервера
+def test_import_does_not_load_telegram():
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, reminder_bot; print('telegram' in sys.modules)"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,154 @@
+import json
+
+from models import SCHEMA_VERSION, Priority, Task, User
+from storage import JournalStore, SqliteStore, read_snapshot, replay_journal
+
+
+def open_journal(tmp_path):
+    return JournalStore(str(tmp_path / "tasks_data.json"), fsync=False)
+
+
+def add_task(store, text):
+    return store.add_task(Task(1, text, Priority.LOW, "@boss", 2))
+
+
+# Аварійне завершення посеред запису: обірваний рядок не повинен поглинути наступні записи
+def test_torn_tail_does_not_swallow_later_records(tmp_path):
+    store = open_journal(tmp_path)
+    store.register_user(User(1, "@worker"))
+    first = add_task(store, "t1")
+    store.close()
+    with open(store.journal_path, 'a', encoding='utf-8') as journal:
+        journal.write('{"op": "task_added", "user_id": 1, "ta')
+
+    store = open_journal(tmp_path)
+    second = add_task(store, "t2")
+    third = add_task(store, "t3")
+    store.close()
+
+    store = open_journal(tmp_path)
+    assert [task.task_text for task in store.tasks_for(1)] == ["t1", "t2", "t3"]
+    assert len({first.id, second.id, third.id}) == 3
+    # Наступні id і seq не повторюють уже виданих
+    fourth = add_task(store, "t4")
+    assert fourth.id > third.id
+    store.close()
+
+    with open(store.journal_path, encoding='utf-8') as journal:
+        seqs = [json.loads(line)["seq"] for line in journal]
+    assert seqs == sorted(set(seqs))
+
+
+# Пошкоджений рядок посеред журналу пропускається, а не обриває програвання
+def test_corrupt_record_in_the_middle_is_skipped(tmp_path):
+    store = open_journal(tmp_path)
+    store.register_user(User(1, "@worker"))
+    add_task(store, "t1")
+    store.close()
+    with open(store.journal_path, encoding='utf-8') as journal:
+        lines = journal.readlines()
+    lines.insert(1, '{"op": "task_add\n')
+    with open(store.journal_path, 'w', encoding='utf-8') as journal:
+        journal.writelines(lines)
+
+    store = open_journal(tmp_path)
+    assert [task.task_text for task in store.tasks_for(1)] == ["t1"]
+    store.close()
+
+
+# Стан після ущільнення збігається зі станом із журналу
+def test_compaction_keeps_state(tmp_path):
+    store = JournalStore(str(tmp_path / "tasks_data.json"), compact_threshold=5, fsync=False)
+    store.register_user(User(1, "@worker"))
+    tasks = [add_task(store, f"t{number}") for number in range(12)]
+    store.complete_task(1, tasks[0].id)
+    store.close()
+
+    store = open_journal(tmp_path)
+    assert [task.task_text for task in store.tasks_for(1)] == [f"t{number}" for number in range(1, 12)]
+    store.close()
+
+
+def test_sqlite_complete_task_removes_only_assignees_task(tmp_path):
+    store = SqliteStore(str(tmp_path / "tasks_data.db"))
+    store.register_user(User(1, "@worker"))
+    task = add_task(store, "t1")
+    assert store.complete_task(3, task.id) is None
+    completed = store.complete_task(1, task.id)
+    assert (completed.id, completed.task_text) == (task.id, "t1")
+    assert store.tasks_for(1) == []
+    assert store.complete_task(1, task.id) is None
+    store.close()
+
+
+# Два процеси одночасно побачили, що бази ще немає: другий імпорт не дублює дані й не падає
+def test_sqlite_seed_import_runs_once(tmp_path):
+    journal = open_journal(tmp_path)
+    journal.register_user(User(1, "@worker"))
+    add_task(journal, "t1")
+    journal.close()
+    seed_state = read_snapshot(journal.path)
+    replay_journal(journal.journal_path, seed_state)
+
+    path = str(tmp_path / "tasks_data.db")
+    late = SqliteStore(path)
+    first = SqliteStore(path, seed_state=seed_state)
+    late._import_state(seed_state)
+    assert [task.task_text for task in late.tasks_for(1)] == ["t1"]
+    assert [task.task_text for task in first.tasks_for(1)] == ["t1"]
+    first.close()
+    late.close()
+
+
+def test_sqlite_tasks_since_sees_other_connections(tmp_path):
+    path = str(tmp_path / "tasks_data.db")
+    leader, worker = SqliteStore(path), SqliteStore(path)
+    first = add_task(leader, "t1")
+    second = add_task(worker, "t2")
+    assert [task.id for task in leader.tasks_since(0)] == [first.id, second.id]
+    assert [task.task_text for task in leader.tasks_since(first.id)] == ["t2"]
+    assert leader._db.execute("PRAGMA busy_timeout").fetchone()[0] == 1000
+    leader.close()
+    worker.close()
+
+
+# Знімок версії 1: json.dump записував ключі int і str одного користувача як однаковий "123"
+SCHEMA_1_SNAPSHOT = '''{
+    "tasks": {
+        "123": [{"task_text": "перше", "priority": "urgent", "assigned_by": "@boss", "assigned_by_id": 7}],
+        "123": [{"task_text": "друге", "priority": "low", "assigned_by": "@boss", "assigned_by_id": 7}],
+        "456": [{"task_text": "третє", "priority": "medium", "assigned_by": "@worker", "assigned_by_id": 123}]
+    },
+    "user_data": {
+        "123": {"username": "@worker", "chat_id": 123},
+        "7": {"username": "@boss", "chat_id": 7}
+    }
+}'''
+
+
+def test_schema_1_snapshot_is_merged_and_migrated(tmp_path):
+    path = tmp_path / "tasks_data.json"
+    path.write_text(SCHEMA_1_SNAPSHOT, encoding='utf-8')
+
+    store = open_journal(tmp_path)
+    assert [task.task_text for task in store.tasks_for(123)] == ["перше", "друге"]
+    assert [task.task_text for task in store.tasks_for(456)] == ["третє"]
+    assert sorted(store.user_data) == [7, 123]
+    tasks = sorted(store.all_tasks(), key=lambda task: task.id)
+    assert [task.id for task in tasks] == [1, 2, 3]
+    assert all(isinstance(task.assignee_id, int) and isinstance(task.assigned_by_id, int) for task in tasks)
+    store.close()
+
+    # Міграція переписує знімок у поточну схему
+    snapshot = json.loads(path.read_text(encoding='utf-8'))
+    assert snapshot["schema"] == SCHEMA_VERSION
+    assert [task["id"] for task in snapshot["tasks"]] == [1, 2, 3]
+    assert [task["assignee_id"] for task in snapshot["tasks"]] == [123, 123, 456]
+
+    store = open_journal(tmp_path)
+    assert [(task.id, task.assignee_id, task.task_text, task.priority) for task in sorted(store.all_tasks(), key=lambda task: task.id)] == [
+        (1, 123, "перше", Priority.URGENT), (2, 123, "друге", Priority.LOW), (3, 456, "третє", Priority.MEDIUM),
+    ]
+    assert store.get_user(123).username == "@worker"
+    assert add_task(store, "нове").id == 4
+    store.close()
@@ -0,0 +1,62 @@
+import asyncio
+
+from webhook import create_webhook_app
+
+
+def request(app, path, client='203.0.113.7', headers=(), method='GET'):
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+             'headers': list(headers), 'client': (client, 40000)}
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent[0]['status']
+
+
+def make_app(admin_token=None):
+    return create_webhook_app(lambda data: None, 'secret', metrics=lambda: b'', admin_token=admin_token)
+
+
+def test_metrics_without_token_only_from_localhost():
+    app = make_app()
+    assert request(app, '/metrics') == 403
+    assert request(app, '/metrics', client='127.0.0.1') == 200
+    assert request(app, '/ping') == 200
+
+
+def test_metrics_with_token_requires_bearer_header():
+    app = make_app('metrics-token')
+    assert request(app, '/metrics', client='127.0.0.1') == 403
+    assert request(app, '/metrics', headers=[(b'authorization', b'Bearer wrong')]) == 403
+    assert request(app, '/metrics', headers=[(b'authorization', b'Bearer metrics-token')]) == 200
+
+
+def test_webhook_enqueues_parsed_body_and_rejects_garbage():
+    received = []
+    app = create_webhook_app(received.append, 'secret')
+    headers = [(b'x-telegram-bot-api-secret-token', b'secret')]
+
+    def post(body, headers=headers):
+        scope = {'type': 'http', 'method': 'POST', 'path': '/webhook', 'query_string': b'',
+                 'headers': headers, 'client': ('203.0.113.7', 40000)}
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(app(scope, receive, send))
+        return sent[0]['status']
+
+    assert post(b'{"update_id": 1}') == 200
+    assert post(b'[1, 2]') == 400
+    assert post(b'{"update_id":') == 400
+    assert post(b'{"update_id": 2}', headers=[]) == 403
+    assert received == [{'update_id': 1}]
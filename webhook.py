@@ -0,0 +1,143 @@
+import hmac
+import json
+import logging
+
+# Швидкий JSON-декодер, якщо встановлено orjson
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = b'x-telegram-bot-api-secret-token'
+
+# Клієнти, яким /metrics і /profile доступні без токена
+LOCAL_CLIENTS = ('127.0.0.1', '::1')
+
+# Telegram не надсилає оновлень, більших за кілька сотень КБ
+MAX_BODY_SIZE = 1024 * 1024
+
+
+def loads(body):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+async def _respond(send, status, body, content_type=b'text/plain; charset=utf-8'):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+# Службові маршрути: з токеном — лише із заголовком Authorization: Bearer <токен>,
+# без нього — лише для запитів із цього ж хоста
+def _authorized(scope, admin_token):
+    if admin_token is not None:
+        header = dict(scope['headers']).get(b'authorization', b'')
+        return hmac.compare_digest(header, b'Bearer ' + admin_token)
+    client = scope.get('client')
+    return client is not None and client[0] in LOCAL_CLIENTS
+
+
+async def _read_body(receive):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_SIZE:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+# ASGI-додаток для вебхука Telegram. Працює в тому ж циклі подій, що й Application,
+# тому оновлення передаються на обробку напряму, без переходу між потоками.
+# Сам модуль не імпортує telegram, тож сервер відповідає ще до завантаження бібліотеки.
+# health — функція, що повертає словник стану для /health;
+# enqueue — функція, що приймає розібране тіло оновлення (dict);
+# metrics — функція, що повертає метрики у текстовому форматі Prometheus для /metrics;
+# profiler — metrics.SamplingProfiler для /profile (без нього маршрут недоступний);
+# admin_token — токен для /metrics і /profile (без нього вони доступні лише локально).
+def create_webhook_app(enqueue, secret_token=None, path='/webhook', health=None,
+                       metrics=None, profiler=None, admin_token=None):
+    expected_token = secret_token.encode() if secret_token else None
+    admin_token = admin_token.encode() if admin_token else None
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            # Життєвим циклом бота керує reminder_bot.main()
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            return
+
+        method = scope['method']
+        route = scope['path']
+        if route == path and method == 'POST':
+            if expected_token is not None:
+                token = dict(scope['headers']).get(SECRET_TOKEN_HEADER, b'')
+                if not hmac.compare_digest(token, expected_token):
+                    await _respond(send, 403, b'forbidden')
+                    return
+            body = await _read_body(receive)
+            if body is None:
+                await _respond(send, 413, b'too large')
+                return
+            try:
+                data = loads(body)
+                if not isinstance(data, dict):
+                    raise TypeError(f"очікувався об'єкт, отримано {type(data).__name__}")
+                enqueue(data)
+            except (ValueError, TypeError, KeyError) as e:
+                logger.warning(f"Некоректне оновлення у вебхуку: {e}")
+                await _respond(send, 400, b'bad request')
+                return
+            await _respond(send, 200, b'ok')
+        elif route == '/ping' and method in ('GET', 'HEAD'):
+            await _respond(send, 200, b'Pong!')
+        elif route == '/health' and method in ('GET', 'HEAD'):
+            status = health() if health is not None else {'status': 'ok'}
+            await _respond(send, 200 if status.get('status') == 'ok' else 503, dumps(status), b'application/json')
+        elif route in ('/metrics', '/profile') and not _authorized(scope, admin_token):
+            await _respond(send, 403, b'forbidden')
+        elif route == '/metrics' and method in ('GET', 'HEAD') and metrics is not None:
+            await _respond(send, 200, metrics(), b'text/plain; version=0.0.4; charset=utf-8')
+        elif route == '/profile' and profiler is not None:
+            # GET — зібрані стеки; POST ?action=start|stop|reset — керування профайлером
+            if method == 'POST':
+                action = dict(pair.split('=', 1) for pair in scope['query_string'].decode().split('&') if '=' in pair).get('action')
+                if action == 'start':
+                    profiler.start()
+                elif action == 'stop':
+                    profiler.stop()
+                elif action == 'reset':
+                    profiler.reset()
+                else:
+                    await _respond(send, 400, b'action must be start, stop or reset')
+                    return
+                await _respond(send, 200, b'ok')
+            else:
+                await _respond(send, 200, profiler.render())
+        else:
+            await _respond(send, 404, b'not found')
+
+    return app